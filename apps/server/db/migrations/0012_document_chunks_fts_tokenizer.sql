@@ -0,0 +1,21 @@
+PRAGMA foreign_keys = ON;
+
+-- E2: rebuild document_chunks_fts with diacritic folding and prefix indexes.
+-- remove_diacritics 2 folds Lithuanian letters (ž -> z, ą -> a, ...) at both index and query time;
+-- prefix indexes let 2-4 character prefix queries ("dekl*") read one doclist instead of scanning terms.
+-- The document_chunks_a* triggers reference the table by name and keep working after the rebuild.
+DROP TABLE IF EXISTS document_chunks_fts;
+
+CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
+  chunk_id UNINDEXED,
+  text,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+
+INSERT INTO document_chunks_fts(rowid, chunk_id, text)
+SELECT rowid, id, text
+FROM document_chunks;
+
+INSERT OR IGNORE INTO schema_migrations(version) VALUES (12);
+PRAGMA user_version = 12;
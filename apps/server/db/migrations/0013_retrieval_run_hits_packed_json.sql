@@ -0,0 +1,20 @@
+PRAGMA foreign_keys = ON;
+
+-- E5: store each hit's sources and citations as packed JSON on the hit row (one row per hit).
+ALTER TABLE retrieval_run_hits ADD COLUMN sources_json TEXT;
+ALTER TABLE retrieval_run_hits ADD COLUMN citations_json TEXT;
+
+-- Backfill runs persisted before this migration (citation order = idx).
+UPDATE retrieval_run_hits
+SET
+  sources_json = json_object('fts_bm25', fts_bm25, 'vector_distance', vector_distance),
+  citations_json = (
+    SELECT json_group_array(json_object('quote', quote, 'start', start, 'end', end, 'source_url', source_url))
+    FROM (SELECT * FROM retrieval_run_citations c WHERE c.hit_id = retrieval_run_hits.id ORDER BY c.idx)
+  )
+WHERE sources_json IS NULL;
+
+-- retrieval_run_citations is no longer written; kept so older builds can still read their runs.
+
+INSERT OR IGNORE INTO schema_migrations(version) VALUES (13);
+PRAGMA user_version = 13;
@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import logging
 import os
+import re
 import sqlite3
 from dataclasses import asdict
 from dataclasses import replace as dc_replace
@@ -35,10 +36,43 @@ def _db_path() -> Path:
     return get_paths().data_dir / "app.db"
 
 
-def _extract_json_object(raw: str) -> Any:
+# Tokens that matter for brace matching: complete string literals (escapes included, so braces
+# inside strings are skipped) and bare braces. Linear scan, no backtracking.
+_JSON_SCAN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]', re.DOTALL)
+
+
+def _json_object_span(text: str) -> tuple[int, int] | None:
+    """
+    [start, end) of the first balanced {...} object in `text` (trailing prose may contain braces).
+    Falls back to first '{' .. last '}' when the braces never balance (e.g. truncated output).
     """
-    Best-effort extraction of a JSON object from an LLM string output.
-    Tries full parse first, then substring from first '{' to last '}'.
+    i = text.find("{")
+    if i == -1:
+        return None
+    depth = 0
+    for m in _JSON_SCAN_RE.finditer(text, i):
+        tok = m.group()
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth -= 1
+            if depth == 0:
+                return i, m.end()
+    j = text.rfind("}")
+    return (i, j + 1) if j > i else None
+
+
+def _is_json_syntax_error(e: ValidationError) -> bool:
+    return any(err.get("type") == "json_invalid" for err in e.errors())
+
+
+def _parse_response(raw: str) -> DefenseDirectionsResponse:
+    """
+    Best-effort parse + validation of an LLM string output in one pass: pydantic-core parses the
+    JSON straight into the model (no intermediate dict/list tree, no second validation walk).
+    Tries the full string first, then the first balanced {...} object (see `_json_object_span`).
+
+    Raises json.JSONDecodeError when no object is present, ValidationError otherwise.
     """
 
     raw_s = (raw or "").strip()
@@ -46,17 +80,17 @@ def _extract_json_object(raw: str) -> Any:
         raise json.JSONDecodeError("Empty string", raw_s, 0)
 
     try:
-        return json.loads(raw_s)
-    except json.JSONDecodeError:
-        pass
-
-    i = raw_s.find("{")
-    j = raw_s.rfind("}")
-    if i == -1 or j == -1 or j <= i:
+        return DefenseDirectionsResponse.model_validate_json(raw_s)
+    except ValidationError as e:
+        # Schema errors on well-formed JSON are final; only syntax errors fall through to extraction.
+        if not _is_json_syntax_error(e):
+            raise
+
+    span = _json_object_span(raw_s)
+    if span is None:
         raise json.JSONDecodeError("No JSON object found", raw_s, 0)
 
-    candidate = raw_s[i : j + 1]
-    return json.loads(candidate)
+    return DefenseDirectionsResponse.model_validate_json(raw_s[span[0] : span[1]])
 
 
 def _repair_prompt(*, schema_json: str, raw: str, error_summary: str) -> str:
@@ -88,6 +122,8 @@ def generate_defense_directions(
     citations: list[dict[str, Any]],
     params: LlamaParams | None = None,
     retrieval_run_id: str | None = None,
+    *,
+    max_repair_attempts: int = 1,
 ) -> DefenseDirectionsResponse:
     """
     Orchestrate generation + JSON parsing + Pydantic schema validation.
@@ -96,7 +132,8 @@ def generate_defense_directions(
     - Prompt requires ONLY JSON.
     - Parse JSON (robust extraction).
     - Validate DefenseDirectionsResponse.
-    - If invalid: do 1 repair attempt.
+    - If invalid: retry with a repair prompt, up to `max_repair_attempts` times (each is a full
+      LLM call; 0 disables repair).
     - If still invalid: return schema-valid fallback with insufficient_authority=true.
     """
 
@@ -154,30 +191,27 @@ def generate_defense_directions(
 
     p_effective = p_use or getattr(runtime, "params", LlamaParams())
 
-    raw1 = runtime.generate(prompt, params=p_use)
-    try:
-        parsed1 = _extract_json_object(raw1)
-        resp1 = DefenseDirectionsResponse.model_validate(parsed1)
-        final1 = enforce_no_citation_no_claim(resp1)
-        _audit_best_effort(final1, p_effective=p_effective)
-        return final1
-    except (json.JSONDecodeError, ValidationError) as e1:
-        error_summary = str(e1)
-
-    repair = _repair_prompt(schema_json=schema_json, raw=raw1, error_summary=error_summary)
-    raw2 = runtime.generate(repair, params=p_use)
-    try:
-        parsed2 = _extract_json_object(raw2)
-        resp2 = DefenseDirectionsResponse.model_validate(parsed2)
-        final2 = enforce_no_citation_no_claim(resp2)
-        _audit_best_effort(final2, p_effective=p_effective)
-        return final2
-    except (json.JSONDecodeError, ValidationError) as e2:
-        info = [
-            "LLM output was not valid JSON per schema after repair attempt.",
-            f"first_error={error_summary[:500]}",
-            f"second_error={str(e2)[:500]}",
-        ]
-        final3 = enforce_no_citation_no_claim(DefenseDirectionsResponse.fallback(missing_info=info))
-        _audit_best_effort(final3, p_effective=p_effective)
-        return final3
+    first_error: str | None = None
+    last_error = ""
+    for _attempt in range(max(0, int(max_repair_attempts)) + 1):
+        raw = runtime.generate(prompt, params=p_use)
+        try:
+            resp = _parse_response(raw)
+        except (json.JSONDecodeError, ValidationError) as e:
+            last_error = str(e)
+            if first_error is None:
+                first_error = last_error
+            prompt = _repair_prompt(schema_json=schema_json, raw=raw, error_summary=last_error)
+            continue
+        final = enforce_no_citation_no_claim(resp)
+        _audit_best_effort(final, p_effective=p_effective)
+        return final
+
+    info = [
+        "LLM output was not valid JSON per schema after repair attempt.",
+        f"first_error={(first_error or '')[:500]}",
+        f"last_error={last_error[:500]}",
+    ]
+    fallback = enforce_no_citation_no_claim(DefenseDirectionsResponse.fallback(missing_info=info))
+    _audit_best_effort(fallback, p_effective=p_effective)
+    return fallback
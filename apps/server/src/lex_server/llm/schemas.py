@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+from functools import cache
 from typing import Any
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -43,12 +45,10 @@ class DefenseDirectionsResponse(BaseModel):
     @classmethod
     def schema_json(cls) -> str:
         """
-        Pretty JSON schema string for inclusion in prompts.
+        Pretty JSON schema string for inclusion in prompts (built once per class, then cached).
         """
 
-        import json
-
-        return json.dumps(cls.model_json_schema(), ensure_ascii=False, indent=2, sort_keys=True)
+        return _schema_json(cls)
 
     @classmethod
     def fallback(cls, missing_info: list[str] | None = None) -> "DefenseDirectionsResponse":
@@ -59,3 +59,22 @@ class DefenseDirectionsResponse(BaseModel):
 
     def as_dict(self) -> dict[str, Any]:
         return self.model_dump()
+
+
+@cache
+def _schema_json(model: type[BaseModel]) -> str:
+    # model_json_schema() walks the whole model tree; the result is immutable for a class.
+    return json.dumps(model.model_json_schema(), ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _warm_up() -> None:
+    # Run the validator's JSON path and build the prompt schema once at import, so the first
+    # orchestrator call does not pay for pydantic-core's lazy setup or model_json_schema().
+    DefenseDirectionsResponse.model_validate_json(
+        b'{"argument_paths":[{"title":"warm","claims":["c"],"supporting_citations":[{"quote":"q"}]}],'
+        b'"counterarguments":[],"risks":[],"missing_info":[],"insufficient_authority":true}'
+    )
+    DefenseDirectionsResponse.schema_json()
+
+
+_warm_up()
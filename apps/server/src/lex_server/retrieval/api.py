@@ -11,10 +11,11 @@ from pydantic import BaseModel, Field
 from .fts_retrieval import FtsFilter, fts_search
 from .query_builder import QueryAtom, QueryPlan
 from .query_executor import execute_fts_plan
+from .embed_batching import get_batching_embedder
+from .sqlite_readonly import readonly_pool
 from .vector_retrieval import VectorFilter, vector_retrieve
-from .vector_index import VectorIndex
-from .hybrid_retrieval import hybrid_retrieve
-from .persistence import create_run, load_run, load_run_hits, persist_run_results
+from .hybrid_retrieval import _get_index, hybrid_retrieve
+from .persistence import create_run, load_run, load_run_hits_cached, persist_run_results
 
 router = APIRouter()
 
@@ -235,12 +236,11 @@ def retrieval_vector(req: VectorRequest) -> JSONResponse:
 
     index_file = _resolve_vector_index_path(index_raw)
 
-    from .embedder_onnx import OnnxEmbedder
-
-    embedder = OnnxEmbedder(model_path)
+    embedder = get_batching_embedder(str(model_path))
 
     try:
-        index = VectorIndex.load(index_file, dim=dim, space="cosine")
+        # Cached per index file (reloaded when it is rebuilt), like the embedder.
+        index = _get_index(str(index_file), dim, "cosine")
     except RuntimeError as e:
         # This is typically: "Cannot open file" or corrupted index
         raise HTTPException(
@@ -254,20 +254,17 @@ def retrieval_vector(req: VectorRequest) -> JSONResponse:
     if not dbp.exists():
         raise HTTPException(status_code=404, detail="DB not found")
 
-    con = sqlite3.connect(dbp)
-    try:
-        con.execute("PRAGMA foreign_keys = ON;")
+    # Pooled read-only connection: prepared statements, page cache and mmap survive across requests.
+    with readonly_pool(str(dbp)).connection() as con:
         hits = vector_retrieve(con, index, embedder, req.query, top_k=req.top_k, flt=flt)
-        return JSONResponse(
-            {
-                "hits": [
-                    {"chunk_id": h.chunk_id, "practice_doc_id": h.practice_doc_id, "distance": h.distance}
-                    for h in hits
-                ]
-            }
-        )
-    finally:
-        con.close()
+    return JSONResponse(
+        {
+            "hits": [
+                {"chunk_id": h.chunk_id, "practice_doc_id": h.practice_doc_id, "distance": h.distance}
+                for h in hits
+            ]
+        }
+    )
 
 
 class HybridRequest(BaseModel):
@@ -391,7 +388,7 @@ def retrieval_get_run(run_id: str) -> JSONResponse:
         except KeyError:
             raise HTTPException(status_code=404, detail="Run not found")
 
-        hits = load_run_hits(con, run_id)
+        hits = load_run_hits_cached(con, run_id)
         return JSONResponse(
             {
                 "run": run,
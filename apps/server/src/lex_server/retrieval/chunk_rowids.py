@@ -0,0 +1,30 @@
+"""
+practice_doc_id -> document_chunks.rowid lookup for pre-filtered vector search.
+
+The HNSW labels are document_chunks rowids, so restricting a search to one practice document needs
+that document's rowid list. It is read per query with an index-only probe, so it always reflects
+the connection's current view (other connections' commits and its own uncommitted writes).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+
+# practice_doc_id is document_chunks.document_id (FK to case_documents.id), so no join is needed.
+# Served from idx_document_chunks_doc_idx (document_id, chunk_index; rowid implicit): no table pages
+# are read.
+_PRACTICE_DOC_ROWIDS_SQL = """
+SELECT rowid
+FROM document_chunks
+WHERE document_id = ?;
+"""
+
+
+def practice_doc_rowids(conn: sqlite3.Connection, practice_doc_id: str) -> np.ndarray:
+    """Read-only int64 array of document_chunks rowids (= ANN labels) for one practice document."""
+    rows = conn.execute(_PRACTICE_DOC_ROWIDS_SQL, (str(practice_doc_id),)).fetchall()
+    out = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    out.setflags(write=False)
+    return out
@@ -0,0 +1,109 @@
+"""
+Micro-batching wrapper for query embedders.
+
+Retrieval endpoints are sync FastAPI handlers, i.e. concurrent requests run on threadpool threads and
+each embeds a single query. `BatchingEmbedder` coalesces concurrent single-text calls into one
+`embed_texts(batch)` call on the wrapped model, so ONNX Runtime runs one larger matmul instead of many
+batch-of-one launches.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+class BatchingEmbedder:
+    """
+    Thread-safe wrapper around an embedder exposing `embed_texts(texts) -> (n, dim)`.
+
+    - `embed_texts([text])` / `embed_text(text)` are queued; a daemon worker embeds everything already
+      queued (at most `max_batch`) together. It waits (up to `max_wait_ms`) only for callers that have
+      entered `embed_texts` but not enqueued yet, so an uncontended query never waits.
+    - Multi-text calls go straight to the wrapped embedder (already batched).
+    - Other attributes (model_path, normalize, is_normalized, ...) are delegated, so cache keys and
+      normalization flags see the wrapped model.
+    """
+
+    def __init__(self, inner: Any, *, max_batch: int = 16, max_wait_ms: float = 5.0) -> None:
+        self.inner = inner
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: queue.SimpleQueue[tuple[str, Future[np.ndarray]]] = queue.SimpleQueue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Single-text callers announced but not yet taken into a batch by the worker.
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on the wrapper itself.
+        return getattr(self.inner, name)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                t = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                t.start()
+                self._worker = t
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch and self._pending > len(batch):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._pending_lock:
+                self._pending -= len(batch)
+            try:
+                vecs = np.asarray(self.inner.embed_texts([t for t, _f in batch]), dtype=np.float32)
+                if vecs.ndim != 2 or vecs.shape[0] != len(batch):
+                    raise ValueError(f"Unexpected embed_texts output shape: {vecs.shape} (expected ({len(batch)}, dim))")
+            except Exception as e:
+                for _t, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for i, (_t, fut) in enumerate(batch):
+                fut.set_result(vecs[i : i + 1])
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        if len(texts) != 1:
+            return self.inner.embed_texts(texts)
+        fut: Future[np.ndarray] = Future()
+        self._ensure_worker()
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((texts[0], fut))
+        return fut.result()
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_texts([text])[0]
+
+
+@lru_cache(maxsize=4)
+def get_batching_embedder(model_path: str) -> BatchingEmbedder:
+    """Process-wide batching ONNX embedder for `model_path` (model loaded once)."""
+    # onnxruntime/tokenizers are optional deps: keep the import lazy.
+    from .embedder_onnx import OnnxEmbedder
+
+    return BatchingEmbedder(OnnxEmbedder(Path(model_path)))
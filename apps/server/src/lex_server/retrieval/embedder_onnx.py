@@ -49,6 +49,11 @@ class OnnxEmbedder:
     max_length: int = 256
     normalize: bool = True
 
+    @property
+    def is_normalized(self) -> bool:
+        """True when embed_texts returns L2-normalized rows (lets VectorIndex skip its own pass)."""
+        return bool(self.normalize)
+
     def __post_init__(self) -> None:
         self.model_path = Path(self.model_path)
 
@@ -15,12 +15,25 @@ Rationale:
 - Lexical precision is usually critical for legal text, but vector improves recall.
 """
 
+import heapq
+import os
 import re
 import sqlite3
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache, partial
+from itertools import chain
+from pathlib import Path
 from typing import Any
 
+import numpy as np
+
+from .embed_batching import get_batching_embedder
 from .fts_retrieval import FtsFilter, FtsHit, fts_search
+from .sqlite_readonly import db_file, readonly_pool
+from .vector_index import VectorIndex, _resolve_index_file
 from .vector_retrieval import VectorFilter, VectorHit, vector_retrieve
 
 
@@ -41,6 +54,53 @@ class HybridHit:
     citations: list[Citation]
 
 
+def _rank_single_signal(
+    hits: list[FtsHit] | list[VectorHit],
+    source: str,
+    top_n: int,
+) -> list[tuple[str, dict[str, Any]]]:
+    """
+    `merge_and_rank` when only one source returned hits: no union/masks, just dedup (best value per
+    chunk_id) and a heap top-k. Scores and ordering are identical to the two-source path.
+    """
+    is_fts = source == "fts_bm25"
+    weight = 0.6 if is_fts else 0.4
+    best: dict[str, float] = {}
+    pdoc: dict[str, str] = {}
+    for h in hits:
+        v = float(h.bm25_score) if is_fts else float(h.distance)  # type: ignore[union-attr]
+        cur = best.get(h.chunk_id)
+        if cur is None:
+            best[h.chunk_id] = v
+            pdoc[h.chunk_id] = h.practice_doc_id
+        elif v < cur:
+            best[h.chunk_id] = v
+    if not best:
+        return []
+
+    ids = list(best)
+    vals = list(best.values())
+    with np.errstate(divide="ignore"):
+        score_l = (weight * (1.0 / (1.0 + np.asarray(vals, dtype=np.float64)))).tolist()
+    tie = vals if is_fts else [1e9] * len(vals)
+    top = heapq.nsmallest(top_n, range(len(ids)), key=lambda i: (-score_l[i], tie[i], ids[i]))
+
+    other = "vector_distance" if is_fts else "fts_bm25"
+    return [
+        (
+            ids[i],
+            {
+                "chunk_id": ids[i],
+                "practice_doc_id": pdoc[ids[i]],
+                source: vals[i],
+                other: None,
+                "score": score_l[i],
+            },
+        )
+        for i in top
+    ]
+
+
 def merge_and_rank(
     fts_hits: list[FtsHit] | None,
     vec_hits: list[VectorHit] | None,
@@ -60,94 +120,110 @@ def merge_and_rank(
     vec_hits = vec_hits or []
     if top_n <= 0:
         return []
-
-    merged: dict[str, dict[str, Any]] = {}
-
-    for h in fts_hits:
-        merged.setdefault(
-            h.chunk_id,
-            {
-                "chunk_id": h.chunk_id,
-                "practice_doc_id": h.practice_doc_id,
-                "fts_bm25": None,
-                "vector_distance": None,
-                "score": 0.0,
-            },
-        )
-        m = merged[h.chunk_id]
-        # Keep best (lowest) bm25
-        if m["fts_bm25"] is None or float(h.bm25_score) < float(m["fts_bm25"]):
-            m["fts_bm25"] = float(h.bm25_score)
-
-    for h in vec_hits:
-        merged.setdefault(
-            h.chunk_id,
+    if not vec_hits:
+        return _rank_single_signal(fts_hits, "fts_bm25", int(top_n))
+    if not fts_hits:
+        return _rank_single_signal(vec_hits, "vector_distance", int(top_n))
+
+    # One row per unique chunk_id (first-seen order; practice_doc_id taken from the first hit).
+    row_of: dict[str, int] = {}
+    ids: list[str] = []
+    pdocs: list[str] = []
+    for h in chain(fts_hits, vec_hits):
+        if h.chunk_id not in row_of:
+            row_of[h.chunk_id] = len(ids)
+            ids.append(h.chunk_id)
+            pdocs.append(h.practice_doc_id)
+    n = len(ids)
+
+    # SoA signals; +inf marks a missing signal so 1/(1+inf) == 0 without branching. The masks keep
+    # "missing -> None" for the output.
+    bm25 = np.full(n, np.inf)
+    dist = np.full(n, np.inf)
+    has_bm25 = np.zeros(n, dtype=bool)
+    has_dist = np.zeros(n, dtype=bool)
+    rows = [row_of[h.chunk_id] for h in fts_hits]
+    np.minimum.at(bm25, rows, [float(h.bm25_score) for h in fts_hits])
+    has_bm25[rows] = True
+    rows = [row_of[h.chunk_id] for h in vec_hits]
+    np.minimum.at(dist, rows, [float(h.distance) for h in vec_hits])
+    has_dist[rows] = True
+
+    with np.errstate(divide="ignore"):
+        score = 0.6 * (1.0 / (1.0 + bm25)) + 0.4 * (1.0 / (1.0 + dist))
+
+    # Partial top-k: keep every candidate tied with the k-th score, then order exactly by
+    # (score DESC, bm25 ASC, chunk_id ASC) so tie-breaking stays deterministic.
+    k = min(int(top_n), n)
+    if k < n:
+        kth = np.partition(-score, k - 1)[k - 1]
+        cand = np.flatnonzero(-score <= kth).tolist()
+    else:
+        cand = list(range(n))
+    score_l = score.tolist()
+    bm25_l = [b if ok else None for b, ok in zip(bm25.tolist(), has_bm25.tolist(), strict=True)]
+    dist_l = [d if ok else None for d, ok in zip(dist.tolist(), has_dist.tolist(), strict=True)]
+    cand.sort(key=lambda i: (-score_l[i], bm25_l[i] if bm25_l[i] is not None else 1e9, ids[i]))
+
+    return [
+        (
+            ids[i],
             {
-                "chunk_id": h.chunk_id,
-                "practice_doc_id": h.practice_doc_id,
-                "fts_bm25": None,
-                "vector_distance": None,
-                "score": 0.0,
+                "chunk_id": ids[i],
+                "practice_doc_id": pdocs[i],
+                "fts_bm25": bm25_l[i],
+                "vector_distance": dist_l[i],
+                "score": score_l[i],
             },
         )
-        m = merged[h.chunk_id]
-        # Keep best (lowest) distance
-        if m["vector_distance"] is None or float(h.distance) < float(m["vector_distance"]):
-            m["vector_distance"] = float(h.distance)
-
-    for m in merged.values():
-        fts_bm25 = m["fts_bm25"]
-        vec_dist = m["vector_distance"]
-        fts_score = (1.0 / (1.0 + float(fts_bm25))) if fts_bm25 is not None else 0.0
-        vec_score = (1.0 / (1.0 + float(vec_dist))) if vec_dist is not None else 0.0
-        m["score"] = 0.6 * fts_score + 0.4 * vec_score
-
-    items = list(merged.items())
-    items.sort(
-        key=lambda kv: (
-            -float(kv[1]["score"]),
-            float(kv[1]["fts_bm25"]) if kv[1]["fts_bm25"] is not None else 1e9,
-            str(kv[0]),
-        )
-    )
-    return items[: int(top_n)]
+        for i in cand[:k]
+    ]
 
 
 _WS_RE = re.compile(r"\s+")
+_PHRASE_RE = re.compile(r'"([^"]+)"')
+_PHRASE_STRIP_RE = re.compile(r'"[^"]+"')
+_NONSPACE_RUN_RE = re.compile(r"\S*")
 
 
 def _collapse_ws(s: str) -> str:
     return _WS_RE.sub(" ", s).strip()
 
 
+@lru_cache(maxsize=256)
+def _terms_regex(terms: tuple[str, ...]) -> re.Pattern[str]:
+    # Alternation order == terms order, so on equal start positions the earlier term wins.
+    return re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+
+
+def _compile_terms(terms: list[str]) -> re.Pattern[str] | None:
+    """Case-insensitive alternation over the non-blank terms, or None when there are none."""
+    cleaned = tuple(t2 for t2 in (t.strip() for t in terms) if t2)
+    return _terms_regex(cleaned) if cleaned else None
+
+
 def _find_first_match(text: str, terms: list[str]) -> tuple[int, int] | None:
     """
     Return (start,end) for the earliest case-insensitive match of any term.
+    Single pass over `text` via one compiled alternation (no lowercased copy of text).
     """
-    low = text.lower()
-    best: tuple[int, int] | None = None
-    for t in terms:
-        t2 = t.strip()
-        if not t2:
-            continue
-        pos = low.find(t2.lower())
-        if pos < 0:
-            continue
-        span = (pos, pos + len(t2))
-        if best is None or span[0] < best[0]:
-            best = span
-    return best
+    term_re = _compile_terms(terms)
+    m = term_re.search(text) if term_re is not None else None
+    if m is None:
+        return None
+    return m.start(), m.end()
 
 
 def _snap_to_word_boundary(text: str, start: int, end: int) -> tuple[int, int]:
     s = max(0, int(start))
     e = min(len(text), int(end))
-    # expand start left to whitespace boundary
-    while s > 0 and not text[s - 1].isspace():
-        s -= 1
-    # expand end right to whitespace boundary
-    while e < len(text) and not text[e].isspace():
-        e += 1
+    # expand start left to whitespace boundary: the nearest ' ' bounds the scan, then the exact
+    # non-space run is measured on the (short) reversed slice, so tabs/newlines/NBSP still count.
+    if s > 0:
+        lo = text.rfind(" ", 0, s) + 1
+        s -= _NONSPACE_RUN_RE.match(text[lo:s][::-1]).end()
+    # expand end right to whitespace boundary (anchored C-level match)
+    e = _NONSPACE_RUN_RE.match(text, e).end()
     return s, e
 
 
@@ -166,16 +242,30 @@ def extract_citations(
     - Else: fallback to first 200 chars.
     - Always returns at least 1 citation.
     """
+    term_re = _compile_terms(query_terms) if query_terms else None
+    return extract_citations_fast(chunk_text, term_re, source_url, max_citations=max_citations)
+
+
+def extract_citations_fast(
+    chunk_text: str,
+    term_re: re.Pattern[str] | None,
+    source_url: str | None,
+    *,
+    max_citations: int = 2,
+) -> list[Citation]:
+    """
+    Same as `extract_citations`, but takes the query-term regex precompiled (see `_compile_terms`)
+    so callers citing many hits for one query build it only once.
+    """
     text = chunk_text or ""
     if text == "":
         return [Citation(quote="", start=0, end=0, source_url=source_url)]
 
-    match = _find_first_match(text, query_terms)
+    match = term_re.search(text) if term_re is not None else None
     citations: list[Citation] = []
 
     if match:
-        m_start, m_end = match
-        center = (m_start + m_end) // 2
+        center = (match.start() + match.end()) // 2
         win = 220
         s0 = max(0, center - win // 2)
         e0 = min(len(text), s0 + win)
@@ -183,10 +273,9 @@ def extract_citations(
         quote = text[s0:e0]
         citations.append(Citation(quote=quote, start=s0, end=e0, source_url=source_url))
     else:
-        e0 = min(len(text), 200)
-        s0, e0 = _snap_to_word_boundary(text, 0, e0)
-        quote = text[s0:e0]
-        citations.append(Citation(quote=quote, start=s0, end=e0, source_url=source_url))
+        # Fallback window starts at 0 (already a boundary): only the end needs snapping.
+        e0 = _NONSPACE_RUN_RE.match(text, min(len(text), 200)).end()
+        citations.append(Citation(quote=text[:e0], start=0, end=e0, source_url=source_url))
 
     # MVP: max 1 citation unless expanded later
     return citations[: max(1, int(max_citations))]
@@ -197,10 +286,10 @@ def _extract_query_terms(query: str) -> list[str]:
     Extract a small list of terms/phrases from raw query string.
     """
     q = query or ""
-    phrases = re.findall(r'"([^"]+)"', q)
+    phrases = _PHRASE_RE.findall(q)
     # remove phrases to avoid duplication
-    q2 = re.sub(r'"[^"]+"', " ", q)
-    words = [w for w in re.split(r"\s+", q2) if w]
+    q2 = _PHRASE_STRIP_RE.sub(" ", q)
+    words = [w for w in _WS_RE.split(q2) if w]
     terms = [t.strip() for t in phrases + words if t.strip()]
     # stable dedup (case-insensitive)
     out: list[str] = []
@@ -214,6 +303,19 @@ def _extract_query_terms(query: str) -> list[str]:
     return out[:20]
 
 
+_CHUNK_TEXTS_SQL = """
+SELECT dc.id AS chunk_id, dc.text, CAST(cd.id AS TEXT) AS practice_doc_id
+FROM document_chunks dc
+JOIN case_documents cd ON dc.document_id = cd.id
+WHERE dc.id IN ({placeholders});
+"""
+
+
+@lru_cache(maxsize=16)
+def _chunk_texts_sql(n: int) -> str:
+    return _CHUNK_TEXTS_SQL.format(placeholders=",".join("?" * n))
+
+
 def _load_chunk_texts(conn: sqlite3.Connection, chunk_ids: list[str]) -> dict[str, dict[str, Any]]:
     """
     Load chunk text and (optional) source URL for citation extraction.
@@ -221,20 +323,62 @@ def _load_chunk_texts(conn: sqlite3.Connection, chunk_ids: list[str]) -> dict[st
     """
     if not chunk_ids:
         return {}
-    placeholders = ",".join(["?"] * len(chunk_ids))
-    rows = conn.execute(
-        f"""
-        SELECT dc.id AS chunk_id, dc.text, CAST(cd.id AS TEXT) AS practice_doc_id
-        FROM document_chunks dc
-        JOIN case_documents cd ON dc.document_id = cd.id
-        WHERE dc.id IN ({placeholders});
-        """,
-        tuple(chunk_ids),
-    ).fetchall()
-    out: dict[str, dict[str, Any]] = {}
-    for chunk_id, text, practice_doc_id in rows:
-        out[str(chunk_id)] = {"text": str(text), "practice_doc_id": str(practice_doc_id), "source_url": None}
-    return out
+    # Pad the IN-list to the next power of two with NULLs (which never match) so only a handful of
+    # distinct SQL texts exist and sqlite3's per-connection statement cache is reused.
+    n = 1 << (len(chunk_ids) - 1).bit_length()
+    params = [*chunk_ids, *([None] * (n - len(chunk_ids)))]
+    # All three columns are TEXT (practice_doc_id via CAST), so sqlite3 already yields str.
+    return {
+        chunk_id: {"text": text, "practice_doc_id": practice_doc_id, "source_url": None}
+        for chunk_id, text, practice_doc_id in conn.execute(_chunk_texts_sql(n), params).fetchall()
+    }
+
+
+@lru_cache(maxsize=1)
+def _vector_config() -> tuple[str, str, int] | None:
+    """
+    (model_path, index_path, dim) from env, read once per process (same env names as the vector endpoint).
+    Returns None when vector retrieval is not configured. Call `_vector_config.cache_clear()` after
+    changing the env at runtime.
+    """
+    model_path = os.environ.get("LEX_EMBED_ONNX_MODEL")
+    index_path = os.environ.get("LEX_VECTOR_INDEX_PATH")
+    dim = os.environ.get("LEX_VECTOR_DIM")
+    if not (model_path and index_path and dim):
+        return None
+    return model_path, index_path, int(dim)
+
+
+def _get_embedder(model_path: str) -> Any:
+    # Shared with the vector endpoint: one model per path, concurrent queries micro-batched.
+    return get_batching_embedder(model_path)
+
+
+# (index_file, dim, space) -> (mtime_ns, index): one slot per index, replaced when the file changes,
+# so a rebuilt index never keeps the previous graph resident.
+_INDEXES: dict[tuple[str, int, str], tuple[int, VectorIndex]] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _get_index(index_path: str, dim: int, space: str) -> VectorIndex:
+    """
+    Process-wide cached VectorIndex. A changed file mtime (rebuilt index) reloads and replaces it.
+    """
+    index_file = _resolve_index_file(Path(index_path))
+    try:
+        mtime_ns = index_file.stat().st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    key = (str(index_file), int(dim), str(space))
+    with _INDEXES_LOCK:
+        hit = _INDEXES.get(key)
+        if hit is not None and hit[0] == mtime_ns:
+            return hit[1]
+        # Drop the stale graph before loading the new one.
+        _INDEXES.pop(key, None)
+        index = VectorIndex.load(index_file, dim=int(dim), space=space)  # type: ignore[arg-type]
+        _INDEXES[key] = (mtime_ns, index)
+        return index
 
 
 def hybrid_retrieve(
@@ -255,41 +399,51 @@ def hybrid_retrieve(
     if not q or top_n <= 0:
         return []
 
-    fts_hits: list[FtsHit] = []
-    if use_fts:
-        fts_hits = fts_search(conn, q, top_n=max(int(top_n) * 3, int(top_n)), flt=filters)
+    fts_top = max(int(top_n) * 3, int(top_n))
+
+    vec_job: Callable[[sqlite3.Connection], list[VectorHit]] | None = None
+    vcfg = _vector_config() if use_vector else None
+    if vcfg is not None:
+        model_path, index_path, dim = vcfg
+        vec_job = partial(
+            vector_retrieve,
+            index=_get_index(index_path, dim, "cosine"),
+            embedder=_get_embedder(model_path),
+            query=q,
+            top_k=fts_top,
+            flt=VectorFilter(practice_doc_id=filters.practice_doc_id if filters else None),
+        )
 
+    fts_hits: list[FtsHit] = []
     vec_hits: list[VectorHit] = []
-    if use_vector:
-        # Runtime configuration via env (same as vector endpoint)
-        import os
-        from pathlib import Path
-
-        model_path = os.environ.get("LEX_EMBED_ONNX_MODEL")
-        index_path = os.environ.get("LEX_VECTOR_INDEX_PATH")
-        dim = os.environ.get("LEX_VECTOR_DIM")
-        if model_path and index_path and dim:
-            from .embedder_onnx import OnnxEmbedder
-            from .vector_index import VectorIndex
-
-            embedder = OnnxEmbedder(Path(model_path))
-            index = VectorIndex.load(Path(index_path), dim=int(dim), space="cosine")
-            vflt = VectorFilter(practice_doc_id=filters.practice_doc_id if filters else None)
-            vec_hits = vector_retrieve(
-                conn, index, embedder, q, top_k=max(int(top_n) * 3, int(top_n)), flt=vflt
-            )
+
+    # FTS and vector branches are independent: run the vector branch on a worker thread over a pooled
+    # read-only connection (sqlite3 connections must not be shared across threads) while FTS runs here.
+    # Pooled readers see only committed data, so inside an open transaction both branches stay on conn.
+    path = db_file(conn) if (use_fts and vec_job is not None and not conn.in_transaction) else None
+    if path is not None:
+        with readonly_pool(path).connection() as ro, ThreadPoolExecutor(max_workers=1) as ex:
+            vec_future = ex.submit(vec_job, ro)
+            fts_hits = fts_search(conn, q, top_n=fts_top, flt=filters)
+            vec_hits = vec_future.result()
+    else:
+        if use_fts:
+            fts_hits = fts_search(conn, q, top_n=fts_top, flt=filters)
+        if vec_job is not None:
+            vec_hits = vec_job(conn)
 
     merged = merge_and_rank(fts_hits, vec_hits, top_n=int(top_n))
     chunk_ids = [cid for cid, _m in merged]
     texts = _load_chunk_texts(conn, chunk_ids)
-    terms = _extract_query_terms(q)
+    # One compiled term regex per query, shared by every hit's citation extraction.
+    term_re = _compile_terms(_extract_query_terms(q))
 
     out: list[HybridHit] = []
     for cid, m in merged:
         t = texts.get(cid, {"text": "", "practice_doc_id": m["practice_doc_id"], "source_url": None})
-        citations = extract_citations(
+        citations = extract_citations_fast(
             t["text"],
-            terms,
+            term_re,
             t.get("source_url"),
             max_citations=2,
         )
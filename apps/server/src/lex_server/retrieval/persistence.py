@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import json
+import os
 import sqlite3
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Any
 
 from .hybrid_retrieval import Citation, HybridHit
+from .sqlite_readonly import db_file
+
+try:  # optional: faster JSON encode/decode; stdlib json is the fallback
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore[assignment]
 
 
 def _utc_now_iso_z() -> str:
@@ -14,9 +23,15 @@ def _utc_now_iso_z() -> str:
 
 
 def _stable_json(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
     return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
 
 
+def _loads_json(raw: str | bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
 def create_run(
     conn: sqlite3.Connection,
     query: str,
@@ -56,41 +71,46 @@ def create_run(
     return run_id
 
 
+_INSERT_HIT_SQL = """
+INSERT INTO retrieval_run_hits(
+  run_id, rank, chunk_id, practice_doc_id, score, fts_bm25, vector_distance, sources_json, citations_json
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+def _dumps_json(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
 def persist_run_results(conn: sqlite3.Connection, run_id: str, hits: list[HybridHit]) -> None:
     """
-    Persist hits + citations in a single transaction.
+    Persist hits in a single transaction: one row per hit, with `sources` and `citations` packed as
+    JSON columns (see 0013_retrieval_run_hits_packed_json.sql).
 
     Ordering:
     - rank is persisted as 0..N-1 based on list order
-    - citations persisted with idx 0.. based on list order
+    - citations keep their list order inside citations_json
     """
+    run_id = str(run_id)
+    rows = [
+        (
+            run_id,
+            rank,
+            h.chunk_id,
+            h.practice_doc_id,
+            float(h.score),
+            h.sources.get("fts_bm25"),
+            h.sources.get("vector_distance"),
+            _dumps_json(h.sources),
+            _dumps_json([[c.quote, int(c.start), int(c.end), c.source_url] for c in h.citations]),
+        )
+        for rank, h in enumerate(hits)
+    ]
     with conn:
-        for rank, h in enumerate(hits):
-            cur = conn.execute(
-                """
-                INSERT INTO retrieval_run_hits(
-                  run_id, rank, chunk_id, practice_doc_id, score, fts_bm25, vector_distance
-                ) VALUES (?, ?, ?, ?, ?, ?, ?);
-                """,
-                (
-                    str(run_id),
-                    int(rank),
-                    h.chunk_id,
-                    h.practice_doc_id,
-                    float(h.score),
-                    h.sources.get("fts_bm25"),
-                    h.sources.get("vector_distance"),
-                ),
-            )
-            hit_id = int(cur.lastrowid)
-            for idx, c in enumerate(h.citations):
-                conn.execute(
-                    """
-                    INSERT INTO retrieval_run_citations(hit_id, idx, quote, start, end, source_url)
-                    VALUES (?, ?, ?, ?, ?, ?);
-                    """,
-                    (hit_id, int(idx), c.quote, int(c.start), int(c.end), c.source_url),
-                )
+        conn.executemany(_INSERT_HIT_SQL, rows)
+    _forget_run_hits(run_id)
 
 
 def load_run(conn: sqlite3.Connection, run_id: str) -> dict[str, Any]:
@@ -105,8 +125,8 @@ def load_run(conn: sqlite3.Connection, run_id: str) -> dict[str, Any]:
     if not row:
         raise KeyError("run not found")
 
-    filters = json.loads(row[4]) if row[4] else None
-    meta = json.loads(row[8]) if row[8] else None
+    filters = _loads_json(row[4]) if row[4] else None
+    meta = _loads_json(row[8]) if row[8] else None
     return {
         "id": str(row[0]),
         "created_at": str(row[1]),
@@ -120,10 +140,26 @@ def load_run(conn: sqlite3.Connection, run_id: str) -> dict[str, Any]:
     }
 
 
+def _citation(c: Any, quotes: dict[str, str]) -> Citation:
+    # Rows written by persist_run_results are [quote, start, end, source_url]; rows backfilled by
+    # the 0013 migration are objects.
+    if isinstance(c, dict):
+        c = (c["quote"], c["start"], c["end"], c.get("source_url"))
+    quote, start, end, url = c
+    quote = str(quote)
+    return Citation(
+        quote=quotes.setdefault(quote, quote),
+        start=int(start),
+        end=int(end),
+        source_url=(str(url) if url is not None else None),
+    )
+
+
 def load_run_hits(conn: sqlite3.Connection, run_id: str) -> list[HybridHit]:
+    """Load hits in rank order (UNIQUE(run_id, rank) index from 0007_retrieval_runs.sql)."""
     rows = conn.execute(
         """
-        SELECT id, rank, chunk_id, practice_doc_id, score, fts_bm25, vector_distance
+        SELECT chunk_id, practice_doc_id, score, sources_json, citations_json
         FROM retrieval_run_hits
         WHERE run_id = ?
         ORDER BY rank ASC;
@@ -131,30 +167,60 @@ def load_run_hits(conn: sqlite3.Connection, run_id: str) -> list[HybridHit]:
         (str(run_id),),
     ).fetchall()
 
-    out: list[HybridHit] = []
-    for hit_id, _rank, chunk_id, practice_doc_id, score, fts_bm25, vector_distance in rows:
-        cit_rows = conn.execute(
-            """
-            SELECT idx, quote, start, end, source_url
-            FROM retrieval_run_citations
-            WHERE hit_id = ?
-            ORDER BY idx ASC;
-            """,
-            (int(hit_id),),
-        ).fetchall()
-        citations = [
-            Citation(quote=str(q), start=int(s), end=int(e), source_url=(str(u) if u is not None else None))
-            for _idx, q, s, e, u in cit_rows
-        ]
-        out.append(
-            HybridHit(
-                chunk_id=str(chunk_id),
-                practice_doc_id=str(practice_doc_id),
-                score=float(score),
-                sources={"fts_bm25": (float(fts_bm25) if fts_bm25 is not None else None),
-                         "vector_distance": (float(vector_distance) if vector_distance is not None else None)},
-                citations=citations,
-            )
+    # The same statute text is often quoted by many hits: identical quotes share one str object
+    # (per call, not sys.intern, so long quotes are not pinned for the process lifetime).
+    quotes: dict[str, str] = {}
+    return [
+        HybridHit(
+            chunk_id=str(chunk_id),
+            practice_doc_id=str(practice_doc_id),
+            score=float(score),
+            sources=_loads_json(sources_json) if sources_json else {},
+            citations=[_citation(c, quotes) for c in _loads_json(citations_json)] if citations_json else [],
         )
-    return out
+        for chunk_id, practice_doc_id, score, sources_json, citations_json in rows
+    ]
+
+
+# Persisted runs are immutable once written, so GET /runs/{id} can reuse decoded hits. Entries are
+# keyed by (db file, run_id); writes to other runs do not touch them (persist_run_results forgets a
+# re-written run). They are checked against the file's inode only, so a DB file replaced by a
+# restore is not served stale. Runs without hits are not cached (they may still be being written).
+_RUN_HITS_CACHE_MAX = 1024
+_RUN_HITS_CACHE: OrderedDict[tuple[str, str], tuple[int, tuple[HybridHit, ...]]] = OrderedDict()
+_RUN_HITS_LOCK = threading.Lock()
+
 
+def _forget_run_hits(run_id: str) -> None:
+    with _RUN_HITS_LOCK:
+        for key in [k for k in _RUN_HITS_CACHE if k[1] == run_id]:
+            del _RUN_HITS_CACHE[key]
+
+
+def load_run_hits_cached(conn: sqlite3.Connection, run_id: str) -> tuple[HybridHit, ...]:
+    """
+    `load_run_hits` behind a per-process LRU (file DBs only). The returned hits are shared between
+    callers and must be treated as read-only.
+    """
+    run_id = str(run_id)
+    path = db_file(conn)
+    if path is None:
+        return tuple(load_run_hits(conn, run_id))
+
+    key = (path, run_id)
+    inode = os.stat(path).st_ino
+    with _RUN_HITS_LOCK:
+        entry = _RUN_HITS_CACHE.get(key)
+        if entry is not None and entry[0] == inode:
+            _RUN_HITS_CACHE.move_to_end(key)
+            return entry[1]
+
+    hits = tuple(load_run_hits(conn, run_id))
+    if not hits:
+        return hits
+    with _RUN_HITS_LOCK:
+        _RUN_HITS_CACHE[key] = (inode, hits)
+        _RUN_HITS_CACHE.move_to_end(key)
+        while len(_RUN_HITS_CACHE) > _RUN_HITS_CACHE_MAX:
+            _RUN_HITS_CACHE.popitem(last=False)
+    return hits
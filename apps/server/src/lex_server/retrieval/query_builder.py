@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any, Literal
 
+import numpy as np
+
 
 Kind = Literal["keywords", "phrase", "norm"]
 
@@ -32,8 +35,14 @@ class QueryPlan:
     atoms: list[QueryAtom]
     k: int
 
+    def weights_np(self) -> np.ndarray:
+        """Atom weights as a float64 array (atom order), for vectorized score fusion."""
+        return np.fromiter((a.weight for a in self.atoms), dtype=np.float64, count=len(self.atoms))
+
 
 _WS_RE = re.compile(r"\s+")
+_DOT_WS_RE = re.compile(r"\s*\.\s*")
+_NUM_STR_RE = re.compile(r"(?i)(\d)(str\.)")
 
 
 def _collapse_ws(s: str) -> str:
@@ -69,9 +78,9 @@ def _truncate_phrase(s: str, max_len: int = 160) -> str:
 def _standardize_norm(s: str) -> str:
     # Minimal standardization: collapse whitespace and remove spaces around dots.
     s = _collapse_ws(s)
-    s = re.sub(r"\s*\.\s*", ".", s)  # "6. 248" -> "6.248"
+    s = _DOT_WS_RE.sub(".", s)  # "6. 248" -> "6.248"
     # Keep "str." readable (optional): ensure a space before "str." if missing
-    s = re.sub(r"(?i)(\d)(str\.)", r"\1 \2", s)
+    s = _NUM_STR_RE.sub(r"\1 \2", s)
     return _collapse_ws(s)
 
 
@@ -111,15 +120,19 @@ def build_query_plan(case_frame: dict | Any, k: int = 6) -> QueryPlan:
     atoms: list[QueryAtom] = []
     seen: set[str] = set()
 
-    def add_atom(text: str, kind: Kind, weight: float) -> None:
+    def add_atom(text: str, kind: Kind, weight: float) -> bool:
+        # Atoms past K would be dropped anyway (priority is the insertion order), so stop early.
+        if len(atoms) >= k:
+            return False
         text = _collapse_ws(text)
         if not text:
-            return
+            return False
         key = _dedup_key(text)
         if key in seen:
-            return
+            return False
         seen.add(key)
         atoms.append(QueryAtom(text=text, kind=kind, weight=float(weight), filters=None))
+        return True
 
     # 1) Summary -> phrase (quoted), weight 1.4
     summary = _get_path(case_frame, "facts", "summary")
@@ -134,6 +147,8 @@ def build_query_plan(case_frame: dict | Any, k: int = 6) -> QueryPlan:
         norms = _get(case_frame, "legal_basis", None)
     if isinstance(norms, list):
         for n in norms:
+            if len(atoms) >= k:
+                break
             if isinstance(n, str):
                 txt = _standardize_norm(n)
             elif isinstance(n, dict):
@@ -153,21 +168,20 @@ def build_query_plan(case_frame: dict | Any, k: int = 6) -> QueryPlan:
                 add_atom(txt, "norm", 1.3)
 
     # 3) Issues / claims / questions -> up to 2 phrase atoms, weight 1.2
-    phrase_sources: list[str] = []
-    for key in ("claims", "issues", "questions"):
-        v = _get(case_frame, key, None)
-        if isinstance(v, list):
-            phrase_sources.extend([x for x in v if isinstance(x, str)])
+    # Candidates are consumed lazily and deduplicated by add_atom, so the loop stops as soon as two
+    # distinct phrases are taken (or K is reached).
+    def phrase_candidates() -> Iterator[str]:
+        for key in ("claims", "issues", "questions"):
+            v = _get(case_frame, key, None)
+            if isinstance(v, list):
+                yield from (x for x in v if isinstance(x, str))
+
     taken = 0
-    for s in phrase_sources:
-        if taken >= 2:
+    for s in phrase_candidates():
+        if taken >= 2 or len(atoms) >= k:
             break
         t = _truncate_phrase(_collapse_ws(s), 160)
-        if not t:
-            continue
-        before = len(atoms)
-        add_atom(_quote_phrase(t), "phrase", 1.2)
-        if len(atoms) != before:
+        if t and add_atom(_quote_phrase(t), "phrase", 1.2):
             taken += 1
 
     # 4) Keywords -> one keywords atom, weight 1.0
@@ -176,9 +190,13 @@ def build_query_plan(case_frame: dict | Any, k: int = 6) -> QueryPlan:
         # Backwards-compat / robustness: allow top-level keywords too.
         keywords = _get(case_frame, "keywords", None)
     if isinstance(keywords, list):
-        kws = [_collapse_ws(x) for x in keywords if isinstance(x, str) and _collapse_ws(x)]
+        # Case-insensitive ordered dedup; the first spelling of each keyword is kept.
+        kws: dict[str, str] = {}
+        for x in keywords:
+            if isinstance(x, str) and (c := _collapse_ws(x)):
+                kws.setdefault(c.casefold(), c)
         if kws:
-            add_atom(" ".join(kws), "keywords", 1.0)
+            add_atom(" ".join(kws.values()), "keywords", 1.0)
 
     # Enforce K with required priority already respected by construction.
     atoms = atoms[: int(k)]
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 import sqlite3
 
-from .fts_retrieval import FtsFilter, fts_search
+import numpy as np
+
+from .fts_retrieval import FtsFilter, FtsHit, fts_search
 from .query_builder import QueryAtom, QueryPlan
+from .sqlite_readonly import db_file, readonly_pool
 
 
 @dataclass(frozen=True)
@@ -17,6 +21,33 @@ class AggregatedHit:
     matches: list[dict]  # debug info: {kind,text,weight,bm25_score}
 
 
+def _search_atoms(
+    conn: sqlite3.Connection,
+    atoms: list[QueryAtom],
+    per_atom: int,
+    flt: FtsFilter | None,
+) -> list[list[FtsHit]]:
+    """
+    One fts_search per atom, results in atom order.
+
+    Atoms are independent, so for file-backed DBs they run concurrently on pooled read-only
+    connections. In-memory DBs, a single atom, or a `conn` with an open transaction use `conn`
+    serially: pooled readers only see committed data, not the caller's own uncommitted writes.
+    """
+    path = db_file(conn) if len(atoms) > 1 and not conn.in_transaction else None
+    if path is None:
+        return [fts_search(conn, atom.text, top_n=per_atom, flt=flt) for atom in atoms]
+
+    pool = readonly_pool(path)
+
+    def run(atom: QueryAtom) -> list[FtsHit]:
+        with pool.connection() as ro:
+            return fts_search(ro, atom.text, top_n=per_atom, flt=flt)
+
+    with ThreadPoolExecutor(max_workers=min(len(atoms), pool.size)) as ex:
+        return list(ex.map(run, atoms))
+
+
 def execute_fts_plan(
     conn: sqlite3.Connection,
     plan: QueryPlan,
@@ -41,43 +72,59 @@ def execute_fts_plan(
     if top_n <= 0 or per_atom <= 0 or not plan.atoms:
         return []
 
-    agg: dict[str, dict] = {}
+    results = _search_atoms(conn, plan.atoms, per_atom, flt)
+    counts = [len(hits) for hits in results]
+    total = sum(counts)
+    if total == 0:
+        return []
 
-    for atom in plan.atoms:
-        hits = fts_search(conn, atom.text, top_n=per_atom, flt=flt)
+    # Flatten all hits into parallel arrays (struct-of-arrays): one light Python pass assigns each
+    # chunk a dense index in first-seen order; scoring and the per-chunk max/min are numpy reductions.
+    slot: dict[str, int] = {}
+    cids: list[str] = []
+    pdocs: list[str] = []
+    cidx = np.empty(total, dtype=np.intp)
+    bm25 = np.empty(total, dtype=np.float64)
+    n = 0
+    for hits in results:
         for h in hits:
-            base = 1.0 / (1.0 + float(h.bm25_score))
-            atom_score = float(atom.weight) * base
-            entry = agg.get(h.chunk_id)
-            match_info = {
-                "kind": atom.kind,
-                "text": atom.text,
-                "weight": float(atom.weight),
-                "bm25_score": float(h.bm25_score),
-            }
-            if entry is None:
-                agg[h.chunk_id] = {
-                    "chunk_id": h.chunk_id,
-                    "practice_doc_id": h.practice_doc_id,
-                    "bm25_score": float(h.bm25_score),
-                    "score": float(atom_score),
-                    "matches": [match_info],
-                }
-            else:
-                entry["bm25_score"] = min(float(entry["bm25_score"]), float(h.bm25_score))
-                entry["score"] = max(float(entry["score"]), float(atom_score))
-                entry["matches"].append(match_info)
-
-    out = [
+            i = slot.get(h.chunk_id)
+            if i is None:
+                i = slot[h.chunk_id] = len(cids)
+                cids.append(h.chunk_id)
+                pdocs.append(h.practice_doc_id)
+            cidx[n] = i
+            bm25[n] = h.bm25_score
+            n += 1
+
+    atom_idx = np.repeat(np.arange(len(results)), counts)
+    atom_scores = plan.weights_np()[atom_idx] * (1.0 / (1.0 + bm25))
+    best_score = np.full(len(cids), -np.inf)
+    np.maximum.at(best_score, cidx, atom_scores)
+    best_bm25 = np.full(len(cids), np.inf)
+    np.minimum.at(best_bm25, cidx, bm25)
+
+    # score DESC, bm25 ASC, chunk_id ASC (lexsort: last key is primary); keep only top_n.
+    order = np.lexsort((np.array(cids), best_bm25, -best_score))[: int(top_n)]
+
+    # Debug match lists only for the returned chunks, in atom order.
+    keep = {int(i): [] for i in order}
+    pos = 0
+    for atom, hits in zip(plan.atoms, results, strict=True):
+        weight = float(atom.weight)
+        for _h in hits:
+            bucket = keep.get(int(cidx[pos]))
+            if bucket is not None:
+                bucket.append({"kind": atom.kind, "text": atom.text, "weight": weight, "bm25_score": float(bm25[pos])})
+            pos += 1
+
+    return [
         AggregatedHit(
-            chunk_id=str(v["chunk_id"]),
-            practice_doc_id=str(v["practice_doc_id"]),
-            bm25_score=float(v["bm25_score"]),
-            score=float(v["score"]),
-            matches=list(v["matches"]),
+            chunk_id=cids[i],
+            practice_doc_id=pdocs[i],
+            bm25_score=float(best_bm25[i]),
+            score=float(best_score[i]),
+            matches=keep[i],
         )
-        for v in agg.values()
+        for i in order.tolist()
     ]
-    out.sort(key=lambda x: (-x.score, x.bm25_score, x.chunk_id))
-    return out[: int(top_n)]
-
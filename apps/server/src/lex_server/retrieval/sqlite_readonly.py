@@ -0,0 +1,96 @@
+"""
+Read-only SQLite connections for running independent retrieval queries on worker threads.
+
+sqlite3 connections must not be shared across threads, so parallel readers each use their own
+`mode=ro` connection to the same database file. In-memory / temp databases cannot be opened twice;
+`db_file()` returns None for them and callers fall back to their serial path.
+
+Note: pooled readers only see committed data, so callers whose connection has an open transaction
+(`conn.in_transaction`) must also use their serial path.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def db_file(conn: sqlite3.Connection) -> str | None:
+    """Absolute path of the connection's main database file, or None for in-memory DBs."""
+    row = conn.execute("PRAGMA database_list;").fetchone()
+    path = str(row[2]) if row and row[2] else ""
+    return path or None
+
+
+def open_readonly(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(
+        f"{Path(path).as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=256,
+    )
+    con.execute("PRAGMA query_only = 1;")
+    # Readers are long-lived (pooled), so a larger page cache, mmap window and prepared-statement
+    # cache pay off across requests.
+    con.execute("PRAGMA cache_size = -65536;")
+    con.execute("PRAGMA mmap_size = 268435456;")
+    return con
+
+
+class ReadOnlyPool:
+    """
+    Bounded pool of read-only connections to one DB file. Connections are opened lazily, reused
+    across calls, and handed out to at most one thread at a time.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = max(1, int(size))
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return open_readonly(self.path)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        con = self._acquire()
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+
+_POOLS: dict[str, ReadOnlyPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def readonly_pool(path: str) -> ReadOnlyPool:
+    """Process-wide pool for `path` (size: CPU count, capped at 8)."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(path)
+        if pool is None:
+            pool = ReadOnlyPool(path, size=min(os.cpu_count() or 1, 8))
+            _POOLS[path] = pool
+        return pool
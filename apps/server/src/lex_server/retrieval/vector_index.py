@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import os
+from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Literal
@@ -15,13 +17,59 @@ except Exception as e:  # pragma: no cover
 
 Space = Literal["cosine", "l2"]
 
+# hnswlib space per VectorIndex space. Cosine runs as inner product: VectorIndex L2-normalizes vectors
+# and queries itself (or trusts assume_normalized), so hnswlib's own per-vector re-normalization in
+# "cosine" is redundant. Distance is 1 - <q, v> either way, and the on-disk format is the same.
+_HNSW_SPACE = {"cosine": "ip", "l2": "l2"}
+
 
 def _l2_normalize_rows(x: np.ndarray) -> np.ndarray:
-    x = np.asarray(x, dtype=np.float32)
+    """
+    L2-normalize rows of a 2D float32 array IN PLACE (no temporaries beyond the norms).
+    Callers must pass a buffer they own.
+    """
+    # Row dot products in one fused pass (einsum), then sqrt/eps/divide all in place.
+    norm = np.einsum("ij,ij->i", x, x)
+    np.sqrt(norm, out=norm)
+    norm += 1e-12
+    np.divide(x, norm[:, None], out=x)
+    return x
+
+
+def _as_float32_rows(a: np.ndarray, dim: int, *, owned: bool) -> np.ndarray:
+    """
+    Single dtype promotion to a C-contiguous float32 (N, dim) array.
+    owned=True always returns a fresh buffer (safe for in-place normalization).
+    """
+    x = np.array(a, dtype=np.float32, order="C") if owned else np.ascontiguousarray(a, dtype=np.float32)
     if x.ndim == 1:
         x = x.reshape(1, -1)
-    denom = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
-    return x / denom
+    if x.ndim != 2 or x.shape[1] != int(dim):
+        raise ValueError(f"Expected shape (N,{dim}); got {x.shape}")
+    return x
+
+
+def _noop_set_threads(_n: int) -> None:
+    return None
+
+
+def _default_num_threads() -> int:
+    """
+    hnswlib thread count for add_items: LEX_HNSW_THREADS, else all CPUs.
+    LEX_HNSW_DETERMINISTIC=1 forces a single thread (reproducible graphs in tests/CI).
+    """
+    if os.environ.get("LEX_HNSW_DETERMINISTIC") == "1":
+        return 1
+    return int(os.environ.get("LEX_HNSW_THREADS") or os.cpu_count() or 1)
+
+
+def _default_query_threads() -> int:
+    return int(os.environ.get("LEX_HNSW_QUERY_THREADS") or os.cpu_count() or 1)
+
+
+# Allowed-id subsets up to this size are scored exactly (get_items + one matmul) instead of a filtered
+# graph walk, which degrades when few nodes pass the filter.
+_EXACT_SUBSET_MAX = 2048
 
 
 def _meta_path(index_path: Path) -> Path:
@@ -31,6 +79,24 @@ def _meta_path(index_path: Path) -> Path:
     return index_path.with_suffix(index_path.suffix + ".meta.json")
 
 
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _replace_atomic(tmp: Path, dst: Path) -> None:
+    """
+    Rename `tmp` over `dst`. No fsync by default (a crashed build is simply re-run); set
+    LEX_HNSW_FSYNC=1 to flush the data before the rename.
+    """
+    if os.environ.get("LEX_HNSW_FSYNC") == "1":
+        fd = os.open(tmp, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    os.replace(tmp, dst)
+
+
 def _resolve_index_file(path: Path) -> Path:
     """
     Accepts:
@@ -54,24 +120,36 @@ class VectorIndex:
     M: int = 16
     ef_construction: int = 200
     _index: "hnswlib.Index" | None = None
+    assume_normalized: bool = False  # vectors and queries are already unit-norm (e.g. embedder.is_normalized): skip cosine normalization
+    _ef: int = -1  # last ef passed to hnswlib (avoid redundant set_ef calls)
 
     def __post_init__(self) -> None:
         if int(self.dim) <= 0:
             raise ValueError("dim must be > 0")
         if self.space not in ("cosine", "l2"):
             raise ValueError(f"space must be 'cosine' or 'l2', got {self.space!r}")
+        # Element count, cached in Python and refreshed after init/add_items/load (one pybind11 call
+        # saved per query). A fresh hnswlib.Index must not be asked: get_current_count() before
+        # init_index/load_index crashes the process.
+        self._n = 0
         if self._index is None:
-            self._index = hnswlib.Index(space=self.space, dim=int(self.dim))
+            self._index = hnswlib.Index(space=_HNSW_SPACE[self.space], dim=int(self.dim))
+        else:
+            self._sync_count()
+        # Feature-detect once: some hnswlib builds lack set_num_threads.
+        self._set_threads: Callable[[int], None] = getattr(self._index, "set_num_threads", None) or _noop_set_threads
 
     @property
     def index(self) -> "hnswlib.Index":
         assert self._index is not None
         return self._index
 
-    def _set_single_thread(self) -> None:
-        # determinism-ish: keep single thread in tests/CI
-        if hasattr(self.index, "set_num_threads"):
-            self.index.set_num_threads(1)
+    @property
+    def _normalizes(self) -> bool:
+        return self.space == "cosine" and not self.assume_normalized
+
+    def _set_num_threads(self, n: int) -> None:
+        self._set_threads(max(1, int(n)))
 
     def init(self, max_elements: int) -> None:
         me = int(max_elements)
@@ -82,26 +160,35 @@ class VectorIndex:
             ef_construction=int(self.ef_construction),
             M=int(self.M),
         )
-        self._set_single_thread()
+        self._n = 0
+        self._set_num_threads(_default_num_threads())
+
+    def _sync_count(self) -> None:
+        self._n = int(getattr(self.index, "get_current_count", lambda: 0)())
 
     def count(self) -> int:
-        return int(getattr(self.index, "get_current_count", lambda: 0)())
+        return self._n
 
     def is_empty(self) -> bool:
-        return self.count() <= 0
+        return self._n <= 0
 
     def set_ef(self, ef: int) -> None:
-        self.index.set_ef(int(ef))
-
-    def add_items(self, vectors: np.ndarray, ids: list[int] | np.ndarray) -> None:
-        vec = np.asarray(vectors, dtype=np.float32)
-        if vec.ndim == 1:
-            vec = vec.reshape(1, -1)
-        if vec.ndim != 2 or vec.shape[1] != int(self.dim):
-            raise ValueError(f"Expected vectors shape (N,{self.dim}); got {vec.shape}")
-        if self.space == "cosine":
-            vec = _l2_normalize_rows(vec)
-        vec = np.ascontiguousarray(vec)
+        ef = int(ef)
+        if ef != self._ef:
+            self.index.set_ef(ef)
+            self._ef = ef
+
+    def add_items(self, vectors: np.ndarray, ids: list[int] | np.ndarray, *, copy: bool = True) -> None:
+        """
+        copy=False hands the buffer over: a C-contiguous float32 input is passed to hnswlib as-is and,
+        for cosine, normalized in place (no copy between the caller's buffer and the index).
+        """
+        try:
+            vec = _as_float32_rows(vectors, self.dim, owned=self._normalizes and copy)
+        except ValueError:
+            raise ValueError(f"Expected vectors shape (N,{self.dim}); got {np.shape(vectors)}") from None
+        if self._normalizes:
+            _l2_normalize_rows(vec)
 
         labels = np.asarray(ids, dtype=np.int32)
         if labels.ndim != 1 or labels.shape[0] != vec.shape[0]:
@@ -109,27 +196,123 @@ class VectorIndex:
         labels = np.ascontiguousarray(labels)
 
         self.index.add_items(vec, labels)
+        # Re-read rather than += rows: re-adding an existing label updates it in place.
+        self._sync_count()
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        top_k: int = 10,
+        *,
+        num_threads: int | None = None,
+        allowed_ids: np.ndarray | list[int] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batched kNN: queries (B, dim) -> labels (B, k) uint64, distances (B, k) float32 (hnswlib's
+        native dtypes, returned without conversion).
 
-    def search(self, query_vec: np.ndarray, top_k: int = 10) -> tuple[np.ndarray, np.ndarray]:
-        q = np.asarray(query_vec, dtype=np.float32)
-        if q.ndim == 1:
-            q = q.reshape(1, -1)
-        if q.ndim != 2 or q.shape[1] != int(self.dim):
-            raise ValueError(f"Expected query shape (N,{self.dim}); got {q.shape}")
-        if self.space == "cosine":
-            q = _l2_normalize_rows(q)
-        q = np.ascontiguousarray(q)
+        hnswlib parallelizes over query rows; num_threads defaults to LEX_HNSW_QUERY_THREADS, else
+        os.cpu_count().
+
+        allowed_ids restricts results to those labels (pre-filter): small subsets are scored exactly,
+        larger ones use hnswlib's filtered search. k is capped at the subset size.
+        """
+        try:
+            q = _as_float32_rows(queries, self.dim, owned=self._normalizes)
+        except ValueError:
+            raise ValueError(f"Expected query shape (N,{self.dim}); got {np.shape(queries)}") from None
+        if self._normalizes:
+            _l2_normalize_rows(q)
 
         n = self.count()
         k = min(int(top_k), n)
         if k <= 0:
-            return np.asarray([], dtype=np.int32), np.asarray([], dtype=np.float32)
+            b = q.shape[0]
+            return np.empty((b, 0), dtype=np.uint64), np.empty((b, 0), dtype=np.float32)
 
-        # hnswlib requires ef >= k
-        self.index.set_ef(max(k, 50))
+        nt = int(num_threads) if num_threads is not None else _default_query_threads()
+        nt = max(1, min(nt, q.shape[0]))
+        if allowed_ids is not None:
+            return self._search_subset(q, k, allowed_ids, nt)
 
-        labels, dists = self.index.knn_query(q, k=k)
-        return labels[0].astype(np.int32, copy=False), dists[0].astype(np.float32, copy=False)
+        # hnswlib requires ef >= k
+        self.set_ef(max(k, 50))
+        return self.index.knn_query(q, k=k, num_threads=nt)
+
+    def _search_subset(
+        self, q: np.ndarray, k: int, allowed_ids: np.ndarray | list[int], nt: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        allowed = np.unique(np.asarray(allowed_ids, dtype=np.int64).reshape(-1))
+        k = min(k, int(allowed.size))
+        if k <= 0:
+            b = q.shape[0]
+            return np.empty((b, 0), dtype=np.uint64), np.empty((b, 0), dtype=np.float32)
+        if allowed.size <= _EXACT_SUBSET_MAX:
+            return self._exact_subset(q, k, allowed)
+
+        member = frozenset(allowed.tolist()).__contains__
+        ef = max(k, 50)
+        while True:
+            self.set_ef(ef)
+            try:
+                return self.index.knn_query(q, k=k, num_threads=nt, filter=member)
+            except RuntimeError:
+                # Fewer than k filtered nodes reached: widen the beam, then give up on the graph.
+                if ef >= self._n:
+                    return self._exact_subset(q, k, allowed)
+                ef = min(ef * 4, self._n)
+
+    def _exact_subset(self, q: np.ndarray, k: int, allowed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Brute-force kNN over `allowed` labels, with hnswlib's distance definitions."""
+        try:
+            labels = allowed
+            vecs = self.index.get_items(labels, return_type="numpy")
+        except RuntimeError:
+            # Some labels are not in the index (stale id list): keep only the present ones.
+            present = []
+            for lab in allowed.tolist():
+                try:
+                    self.index.get_items([lab], return_type="numpy")
+                except RuntimeError:
+                    continue
+                present.append(lab)
+            labels = np.asarray(present, dtype=np.int64)
+            k = min(k, int(labels.size))
+            if k <= 0:
+                b = q.shape[0]
+                return np.empty((b, 0), dtype=np.uint64), np.empty((b, 0), dtype=np.float32)
+            vecs = self.index.get_items(labels, return_type="numpy")
+        vecs = np.asarray(vecs, dtype=np.float32)
+
+        dots = q @ vecs.T  # (B, m)
+        if self.space == "cosine":
+            # Stored cosine vectors are unit-norm; distance = 1 - <q, v> (hnswlib "ip").
+            dists = 1.0 - dots
+        else:
+            # hnswlib "l2" is the squared Euclidean distance.
+            dists = np.einsum("ij,ij->i", q, q)[:, None] - 2.0 * dots + np.einsum("ij,ij->i", vecs, vecs)[None, :]
+        dists = dists.astype(np.float32, copy=False)
+
+        if k < dists.shape[1]:
+            part = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(dists.shape[1]), dists.shape).copy()
+        part_d = np.take_along_axis(dists, part, axis=1)
+        order = np.argsort(part_d, axis=1, kind="stable")
+        top = np.take_along_axis(part, order, axis=1)
+        return labels[top].astype(np.uint64), np.take_along_axis(part_d, order, axis=1)
+
+    def search(
+        self, query_vec: np.ndarray, top_k: int = 10, *, allowed_ids: np.ndarray | list[int] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        kNN for one query (dim,) -> labels (k,), distances (k,); a 2-D (B, dim) input is searched as
+        one batch and returns (B, k) arrays (see `search_batch`).
+        """
+        if np.ndim(query_vec) == 2:
+            return self.search_batch(query_vec, top_k, allowed_ids=allowed_ids)
+        labels, dists = self.search_batch(query_vec, top_k, num_threads=1, allowed_ids=allowed_ids)
+        return labels[0], dists[0]
 
     def save(self, path: Path) -> Path:
         """
@@ -141,8 +324,10 @@ class VectorIndex:
         index_file = _resolve_index_file(Path(path))
         index_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # write index
-        self.index.save_index(str(index_file))
+        # write index (temp file + rename: a crash never leaves a torn index behind)
+        tmp = _tmp_path(index_file)
+        self.index.save_index(str(tmp))
+        _replace_atomic(tmp, index_file)
 
         # write metadata (handy for safe load)
         meta = {
@@ -152,7 +337,10 @@ class VectorIndex:
             "M": int(self.M),
             "ef_construction": int(self.ef_construction),
         }
-        _meta_path(index_file).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        meta_file = _meta_path(index_file)
+        tmp = _tmp_path(meta_file)
+        tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        _replace_atomic(tmp, meta_file)
         return index_file
 
     @classmethod
@@ -199,5 +387,6 @@ class VectorIndex:
                 max_el = 1
 
         idx.index.load_index(str(index_file), max_elements=max_el)
-        idx._set_single_thread()
+        idx._sync_count()
+        idx._set_num_threads(_default_num_threads())
         return idx
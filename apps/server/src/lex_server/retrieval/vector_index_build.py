@@ -14,8 +14,10 @@ Design notes:
 import argparse
 import json
 import os
+import queue
 import sqlite3
-from collections.abc import Iterable
+import threading
+from collections.abc import Iterable, Iterator, Mapping
 from pathlib import Path
 from typing import Any, Literal
 
@@ -25,6 +27,11 @@ from .vector_index import VectorIndex
 
 Space = Literal["cosine", "l2"]
 
+# SQL/embedding batches per hnswlib add_items call.
+_SUPER_BATCHES = 16
+# Embedded batches buffered between the embedding thread and the insert worker.
+_QUEUE_DEPTH = 4
+
 
 def _default_db_path() -> Path:
     # Must match the app's convention: prefer legacy .localdata/app.db if it exists, else A2 data_dir/app.db
@@ -42,27 +49,36 @@ def _default_indices_dir() -> Path:
     return get_paths().data_dir / "indices"
 
 
-def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
-    r = conn.execute(
-        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;",
-        (name,),
-    ).fetchone()
-    return r is not None
+def _table_columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    # One table-valued PRAGMA query; empty when the table does not exist.
+    return {str(r[0]) for r in conn.execute("SELECT name FROM pragma_table_info(?);", (table,))}
 
 
-def _has_columns(conn: sqlite3.Connection, table: str, cols: set[str]) -> bool:
-    rows = conn.execute(f"PRAGMA table_info({table});").fetchall()
-    got = {str(r[1]) for r in rows}
-    return cols.issubset(got)
+ChunkSchema = tuple[Literal["document_chunks", "chunks"], bool]
 
 
-def iter_chunks(
+def _detect_schema(conn: sqlite3.Connection) -> ChunkSchema:
+    """
+    (chunk table, whether case_documents has (id, case_id)).
+
+    sqlite3 connections cannot be weak-referenced, so there is no per-connection cache: callers doing
+    several queries (build_vector_index) detect once and pass the result along.
+    """
+    if {"id", "text"} <= _table_columns(conn, "document_chunks"):
+        return "document_chunks", {"id", "case_id"} <= _table_columns(conn, "case_documents")
+    # Minimal fallback schema (tests/dev)
+    if {"id", "chunk_id", "content"} <= _table_columns(conn, "chunks"):
+        return "chunks", False
+    raise ValueError("No supported chunk table found (expected document_chunks or chunks).")
+
+
+def _chunks_query(
     conn: sqlite3.Connection,
-    *,
-    case_id: str | None = None,
-) -> Iterable[tuple[int, str, str]]:
+    case_id: str | None,
+    schema: ChunkSchema | None = None,
+) -> tuple[str, tuple[Any, ...]]:
     """
-    Yield (chunk_int_id, chunk_id_str, content_text).
+    SQL + params selecting (chunk_int_id, chunk_id_str, content_text) for the detected schema.
 
     Production schema:
     - document_chunks(id TEXT, text TEXT, document_id INTEGER, ...)
@@ -72,43 +88,75 @@ def iter_chunks(
 
     Optional filter:
     - by case_id via JOIN document_chunks.document_id -> case_documents.id and case_documents.case_id
+
+    Rows are grouped per document (document_id, then rowid) so a document's chunks are embedded and
+    inserted together; labels are still rowids. idx_document_chunks_doc_idx (0005) serves the
+    document_id prefix, leaving only a per-document rowid sort.
     """
-    if _table_exists(conn, "document_chunks") and _has_columns(conn, "document_chunks", {"id", "text"}):
+    table, has_case_docs = schema or _detect_schema(conn)
+    if table == "document_chunks":
         if case_id:
-            if not _table_exists(conn, "case_documents") or not _has_columns(conn, "case_documents", {"id", "case_id"}):
+            if not has_case_docs:
                 raise ValueError("case_documents table missing or does not have required columns (id, case_id)")
             sql = """
             SELECT dc.rowid AS int_id, dc.id AS chunk_id, dc.text AS content
             FROM document_chunks dc
             JOIN case_documents cd ON cd.id = dc.document_id
             WHERE cd.case_id = ?
-            ORDER BY dc.rowid ASC
+            ORDER BY dc.document_id ASC, dc.rowid ASC
             """
-            for int_id, chunk_id, content in conn.execute(sql, (case_id,)):
-                yield int(int_id), str(chunk_id), str(content)
-            return
+            return sql, (case_id,)
 
         sql = """
         SELECT dc.rowid AS int_id, dc.id AS chunk_id, dc.text AS content
         FROM document_chunks dc
-        ORDER BY dc.rowid ASC
+        ORDER BY dc.document_id ASC, dc.rowid ASC
         """
-        for int_id, chunk_id, content in conn.execute(sql):
-            yield int(int_id), str(chunk_id), str(content)
-        return
+        return sql, ()
 
-    # Minimal fallback schema (tests/dev)
-    if _table_exists(conn, "chunks") and _has_columns(conn, "chunks", {"id", "chunk_id", "content"}):
-        sql = "SELECT id, chunk_id, content FROM chunks ORDER BY id ASC"
-        for int_id, chunk_id, content in conn.execute(sql):
-            yield int(int_id), str(chunk_id), str(content)
-        return
+    return "SELECT id, chunk_id, content FROM chunks ORDER BY id ASC", ()
 
-    raise ValueError("No supported chunk table found (expected document_chunks or chunks).")
 
+def iter_chunk_batches(
+    conn: sqlite3.Connection,
+    batch_size: int,
+    *,
+    case_id: str | None = None,
+    schema: ChunkSchema | None = None,
+) -> Iterator[list[tuple[int, str, str]]]:
+    """
+    Yield lists of up to `batch_size` (chunk_int_id, chunk_id_str, content_text) rows, fetched with
+    `fetchmany` (one C-level call per batch instead of one generator step per row).
+    Rows come straight from sqlite3: the selected columns are INTEGER/TEXT/TEXT already.
+    """
+    bs = max(1, int(batch_size))
+    sql, params = _chunks_query(conn, case_id, schema)
+    cur = conn.execute(sql, params)
+    cur.arraysize = bs
+    while rows := cur.fetchmany(bs):
+        yield rows
 
-def _count_chunks(conn: sqlite3.Connection, *, case_id: str | None = None) -> int:
-    if _table_exists(conn, "document_chunks") and _has_columns(conn, "document_chunks", {"id", "text"}):
+
+def iter_chunks(
+    conn: sqlite3.Connection,
+    *,
+    case_id: str | None = None,
+) -> Iterable[tuple[int, str, str]]:
+    """
+    Yield (chunk_int_id, chunk_id_str, content_text). See `_chunks_query` for the supported schemas.
+    """
+    for rows in iter_chunk_batches(conn, 512, case_id=case_id):
+        yield from rows
+
+
+def _count_chunks(
+    conn: sqlite3.Connection,
+    *,
+    case_id: str | None = None,
+    schema: ChunkSchema | None = None,
+) -> int:
+    table, _has_case_docs = schema or _detect_schema(conn)
+    if table == "document_chunks":
         if case_id:
             sql = """
             SELECT COUNT(*)
@@ -119,18 +167,100 @@ def _count_chunks(conn: sqlite3.Connection, *, case_id: str | None = None) -> in
             return int(conn.execute(sql, (case_id,)).fetchone()[0])
         return int(conn.execute("SELECT COUNT(*) FROM document_chunks;").fetchone()[0])
 
-    if _table_exists(conn, "chunks") and _has_columns(conn, "chunks", {"id", "chunk_id", "content"}):
-        return int(conn.execute("SELECT COUNT(*) FROM chunks;").fetchone()[0])
+    return int(conn.execute("SELECT COUNT(*) FROM chunks;").fetchone()[0])
 
-    raise ValueError("No supported chunk table found (expected document_chunks or chunks).")
 
+IdmapFormat = Literal["bin", "json"]
+
+_IDMAP_MAGIC = b"LXIDMAP1"
+_IDMAP_HEADER = 16  # magic + uint32 n + uint32 width
+
+
+class IdMap(Mapping[int, str]):
+    """
+    Read-only label -> chunk_id view over a binary idmap. Both arrays are memory-mapped; lookups
+    binary-search the sorted label array, so loading is O(1) regardless of index size.
+    """
+
+    def __init__(self, labels: np.ndarray, chunk_ids: np.ndarray) -> None:
+        self._labels = labels
+        self._chunk_ids = chunk_ids
 
-def _l2_normalize_rows(x: np.ndarray) -> np.ndarray:
-    x = np.asarray(x, dtype=np.float32)
-    if x.ndim == 1:
-        x = x.reshape(1, -1)
-    denom = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
-    return x / denom
+    def __getitem__(self, label: int) -> str:
+        i = int(np.searchsorted(self._labels, label))
+        if i < self._labels.shape[0] and int(self._labels[i]) == int(label):
+            return bytes(self._chunk_ids[i]).decode("utf-8")
+        raise KeyError(label)
+
+    def __len__(self) -> int:
+        return int(self._labels.shape[0])
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._labels.tolist())
+
+
+def _idmap_format_for(path: Path) -> IdmapFormat:
+    return "bin" if path.suffix.lower() == ".bin" else "json"
+
+
+def write_idmap(
+    path: Path,
+    labels: list[int],
+    chunk_ids: list[str],
+    *,
+    fmt: IdmapFormat | None = None,
+) -> None:
+    """
+    Write label -> chunk_id. Format defaults from the suffix (.bin -> binary, else JSON).
+
+    Binary layout (little-endian): magic, uint32 n, uint32 width, int32[n] sorted labels,
+    then n fixed-width UTF-8 chunk ids (NUL-padded to the longest one).
+    """
+    fmt = fmt or _idmap_format_for(path)
+    if fmt == "json":
+        path.write_text(
+            json.dumps({str(k): v for k, v in zip(labels, chunk_ids, strict=True)}, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        return
+
+    lab = np.asarray(labels, dtype=np.int32)
+    order = np.argsort(lab, kind="stable")
+    encoded = [c.encode("utf-8") for c in chunk_ids]
+    width = max((len(b) for b in encoded), default=1) or 1
+    ids = np.array(encoded, dtype=f"S{width}")[order] if encoded else np.empty(0, dtype=f"S{width}")
+    with path.open("wb") as f:
+        f.write(_IDMAP_MAGIC)
+        f.write(np.array([lab.shape[0], width], dtype="<u4").tobytes())
+        f.write(lab[order].astype("<i4", copy=False).tobytes())
+        f.write(ids.tobytes())
+
+
+def load_idmap(path: Path) -> Mapping[int, str]:
+    """Load an idmap written by `write_idmap` (binary -> memory-mapped `IdMap`, JSON -> dict)."""
+    with path.open("rb") as f:
+        head = f.read(_IDMAP_HEADER)
+    if not head.startswith(_IDMAP_MAGIC):
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        return {int(k): str(v) for k, v in raw.items()}
+
+    n, width = (int(x) for x in np.frombuffer(head, dtype="<u4", offset=len(_IDMAP_MAGIC)))
+    if n == 0:
+        return IdMap(np.empty(0, dtype=np.int32), np.empty(0, dtype="S1"))
+    labels = np.memmap(path, dtype="<i4", mode="r", offset=_IDMAP_HEADER, shape=(n,))
+    chunk_ids = np.memmap(path, dtype=f"S{width}", mode="r", offset=_IDMAP_HEADER + 4 * n, shape=(n,))
+    return IdMap(labels, chunk_ids)
+
+
+def _embedder_dim(embedder: Any) -> int:
+    """Embedding width: `embedder.dim` when it exposes one, else a one-text probe."""
+    dim = getattr(embedder, "dim", None)
+    if isinstance(dim, (int, np.integer)) and int(dim) > 0:
+        return int(dim)
+    probe = np.asarray(embedder.embed_texts([""]), dtype=np.float32)
+    if probe.ndim != 2 or probe.shape[0] != 1:
+        raise ValueError(f"Unexpected embedder output shape: {probe.shape}")
+    return int(probe.shape[1])
 
 
 def build_vector_index(
@@ -144,100 +274,137 @@ def build_vector_index(
     M: int = 16,
     ef_construction: int = 200,
     case_id: str | None = None,
+    idmap_format: IdmapFormat | None = None,
 ) -> int:
     """
-    Build and write an HNSW index + idmap.
+    Build and write an HNSW index + idmap (format: `idmap_format`, else from the idmap path suffix).
 
     `embedder` must provide:
     - embed_texts(texts: list[str]) -> np.ndarray float32 shape (n,d)
+    - optionally `dim` (int); otherwise it is probed with one empty text
 
     Returns number of indexed chunks.
     """
-    n = _count_chunks(conn, case_id=case_id)
+    schema = _detect_schema(conn)
+    n = _count_chunks(conn, case_id=case_id, schema=schema)
     if n <= 0:
         raise ValueError("No chunks to index")
 
-    it = iter(iter_chunks(conn, case_id=case_id))
-
-    # prime first batch to get dim
-    first_batch: list[tuple[int, str, str]] = []
-    for _ in range(min(int(batch_size), n)):
-        try:
-            first_batch.append(next(it))
-        except StopIteration:
-            break
-    if not first_batch:
-        raise ValueError("No chunks to index")
-
-    texts0 = [t for _i, _cid, t in first_batch]
-    vec0 = np.asarray(embedder.embed_texts(texts0), dtype=np.float32)
-    if vec0.ndim != 2 or vec0.shape[0] != len(texts0):
-        raise ValueError(f"Unexpected embedder output shape: {vec0.shape}")
-    dim = int(vec0.shape[1])
-    if space == "cosine":
-        vec0 = _l2_normalize_rows(vec0)
+    # Size the index before the hot loop so every real batch takes the same (threaded) path.
+    dim = _embedder_dim(embedder)
+    batches = iter_chunk_batches(conn, batch_size, case_id=case_id, schema=schema)
 
     idx = VectorIndex(dim=dim, space=space)
     idx.M = int(M)
     idx.ef_construction = int(ef_construction)
+    idx.assume_normalized = bool(getattr(embedder, "is_normalized", False))
     idx.init(max_elements=n)
 
-    idmap: dict[int, str] = {}
-
-    def add_batch(batch: list[tuple[int, str, str]], vecs: np.ndarray) -> None:
-        int_ids = [int(x[0]) for x in batch]
-        for int_id, chunk_id, _t in batch:
-            idmap[int(int_id)] = str(chunk_id)
-        idx.add_items(vecs, np.asarray(int_ids, dtype=np.int32))
-
-    add_batch(first_batch, vec0)
-    processed = len(first_batch)
-
-    pending: list[tuple[int, str, str]] = []
-    for row in it:
-        pending.append(row)
-        if len(pending) >= int(batch_size):
-            texts = [t for _i, _cid, t in pending]
-            vec = np.asarray(embedder.embed_texts(texts), dtype=np.float32)
+    # label -> chunk_id as two parallel lists (labels are unique rowids); write_idmap takes them as-is.
+    all_int_ids: list[int] = []
+    all_chunk_ids: list[str] = []
+
+    # Rows are staged in a reused super-batch buffer and handed to hnswlib every
+    # _SUPER_BATCHES SQL batches: far fewer add_items calls (and thread-team launches).
+    sb_rows = max(1, int(batch_size)) * _SUPER_BATCHES
+    buf = np.empty((sb_rows, dim), dtype=np.float32)
+    buf_ids = np.empty(sb_rows, dtype=np.int32)
+    fill = 0
+
+    def flush() -> None:
+        nonlocal fill
+        if fill:
+            # The staging buffer is ours: let add_items normalize it in place instead of copying.
+            idx.add_items(buf[:fill], buf_ids[:fill], copy=False)
+            fill = 0
+
+    def add_batch(int_ids: tuple[int, ...], chunk_ids: tuple[str, ...], vecs: np.ndarray) -> None:
+        nonlocal fill
+        m = len(int_ids)
+        if fill + m > sb_rows:
+            flush()
+        buf[fill : fill + m] = vecs
+        buf_ids[fill : fill + m] = int_ids
+        all_int_ids.extend(int_ids)
+        all_chunk_ids.extend(chunk_ids)
+        fill += m
+
+    # Embedding (ONNX) and graph insertion (hnswlib) both release the GIL, so they overlap: this
+    # thread fetches + embeds (the sqlite3 connection stays on its own thread), a worker inserts.
+    # The bounded queue keeps at most _QUEUE_DEPTH embedded batches in flight.
+    work: queue.Queue[tuple[tuple[int, ...], tuple[str, ...], np.ndarray] | None] = queue.Queue(maxsize=_QUEUE_DEPTH)
+    errors: list[BaseException] = []
+
+    def consume() -> None:
+        while (item := work.get()) is not None:
+            if errors:
+                continue  # keep draining so the producer never blocks on a dead consumer
+            try:
+                add_batch(*item)
+            except BaseException as e:  # re-raised on the caller's thread
+                errors.append(e)
+        if not errors:
+            try:
+                flush()
+            except BaseException as e:
+                errors.append(e)
+
+    worker = threading.Thread(target=consume, name="vector-index-insert", daemon=True)
+    worker.start()
+    processed = 0
+    try:
+        for batch in batches:
+            if errors:
+                break
+            # One C-level transpose per fetched batch instead of per-column list comprehensions.
+            int_ids, chunk_ids, texts = zip(*batch, strict=True)
+            vec = np.asarray(embedder.embed_texts(list(texts)), dtype=np.float32)
             if vec.shape != (len(texts), dim):
                 raise ValueError(f"Embedder output shape mismatch: got {vec.shape}, expected ({len(texts)},{dim})")
-            if space == "cosine":
-                vec = _l2_normalize_rows(vec)
-            add_batch(pending, vec)
-            processed += len(pending)
+            if processed == 0 and idx.assume_normalized and space == "cosine":
+                # Catch an embedder that claims unit-norm output but does not deliver it.
+                norm0 = float(np.linalg.norm(vec[0]))
+                if abs(norm0 - 1.0) >= 1e-4:
+                    raise ValueError(f"embedder.is_normalized is set but the first vector has norm {norm0:.6f}")
+            work.put((int_ids, chunk_ids, vec))
+            processed += len(int_ids)
             if processed % 500 == 0:
                 print(f"Indexed {processed}/{n} chunks...")
-            pending = []
-
-    if pending:
-        texts = [t for _i, _cid, t in pending]
-        vec = np.asarray(embedder.embed_texts(texts), dtype=np.float32)
-        if vec.shape != (len(texts), dim):
-            raise ValueError(f"Embedder output shape mismatch: got {vec.shape}, expected ({len(texts)},{dim})")
-        if space == "cosine":
-            vec = _l2_normalize_rows(vec)
-        add_batch(pending, vec)
-        processed += len(pending)
+    finally:
+        work.put(None)
+        worker.join()
+    if errors:
+        raise errors[0]
+    if processed == 0:
+        raise ValueError("No chunks to index")
 
     out_index_path.parent.mkdir(parents=True, exist_ok=True)
     out_idmap_path.parent.mkdir(parents=True, exist_ok=True)
 
     idx.save(out_index_path)
-    out_idmap_path.write_text(
-        json.dumps({str(k): v for k, v in idmap.items()}, ensure_ascii=False, indent=2) + "\n",
-        encoding="utf-8",
-    )
+    write_idmap(out_idmap_path, all_int_ids, all_chunk_ids, fmt=idmap_format)
 
     print(f"Index built. chunks={processed}, dim={dim}, index={out_index_path}, idmap={out_idmap_path}")
     return processed
 
 
+# The build only reads: one sequential scan of document_chunks.text. Connection-local settings only
+# (no journal_mode change, which would persist in the app's DB file).
+_BUILD_PRAGMAS = (
+    "PRAGMA query_only = 1;",
+    "PRAGMA cache_size = -524288;",  # 512 MiB page cache
+    "PRAGMA mmap_size = 34359738368;",  # up to 32 GiB (SQLite clamps to its compile-time max)
+    "PRAGMA temp_store = MEMORY;",
+)
+
+
 def main() -> None:
     p = argparse.ArgumentParser(description="Build HNSW vector index from SQLite chunks (E3b).")
     p.add_argument("--db", type=Path, default=None, help="Path to sqlite db (default: auto)")
     p.add_argument("--onnx", type=Path, default=None, help="Path to ONNX embedding model")
     p.add_argument("--out", type=Path, default=None, help="Output index path")
-    p.add_argument("--idmap", type=Path, default=None, help="Output idmap json path")
+    p.add_argument("--idmap", type=Path, default=None, help="Output idmap path (.bin: binary, else JSON)")
+    p.add_argument("--legacy-idmap", action="store_true", help="Always write the idmap as JSON")
     p.add_argument("--space", type=str, default=os.environ.get("LEX_VECTOR_SPACE", "cosine"))
     p.add_argument("--batch-size", type=int, default=int(os.environ.get("LEX_VECTOR_BATCH_SIZE", "128")))
     p.add_argument("--M", type=int, default=int(os.environ.get("LEX_VECTOR_M", "16")))
@@ -250,7 +417,10 @@ def main() -> None:
 
     # IMPORTANT: align with retrieval endpoint env names
     out_index = args.out or Path(os.environ.get("LEX_VECTOR_INDEX_PATH", str(indices_dir / "chunks_hnsw.bin")))
-    out_idmap = args.idmap or Path(os.environ.get("LEX_VECTOR_IDMAP_PATH", str(indices_dir / "chunks_hnsw_idmap.json")))
+    # Without --legacy-idmap the format follows the path suffix (the default path is binary).
+    idmap_format = "json" if args.legacy_idmap else None
+    default_idmap = indices_dir / ("chunks_hnsw_idmap.json" if args.legacy_idmap else "chunks_hnsw_idmap.bin")
+    out_idmap = args.idmap or Path(os.environ.get("LEX_VECTOR_IDMAP_PATH", str(default_idmap)))
 
     # Align with endpoint env name
     onnx_path = args.onnx or (Path(os.environ["LEX_EMBED_ONNX_MODEL"]) if "LEX_EMBED_ONNX_MODEL" in os.environ else None)
@@ -263,7 +433,8 @@ def main() -> None:
 
     conn = sqlite3.connect(dbp)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
+        for pragma in _BUILD_PRAGMAS:
+            conn.execute(pragma)
         build_vector_index(
             conn,
             embedder,
@@ -274,6 +445,7 @@ def main() -> None:
             M=int(args.M),
             ef_construction=int(args.ef_construction),
             case_id=(str(args.case_id) if args.case_id else None),
+            idmap_format=idmap_format,  # type: ignore[arg-type]
         )
     finally:
         conn.close()
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import json
 import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
 from dataclasses import dataclass
+from itertools import islice
 from typing import Protocol, runtime_checkable
 
 import numpy as np
 
+from .chunk_rowids import practice_doc_rowids
 from .vector_index import VectorIndex
 
 
@@ -27,21 +33,53 @@ class EmbedderLike(Protocol):
     def embed_texts(self, texts: list[str]) -> np.ndarray: ...
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class VectorHit:
     chunk_id: str
     practice_doc_id: str
     distance: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class VectorFilter:
     practice_doc_id: str | None = None
 
 
-def vector_search(index: VectorIndex, query_vec: np.ndarray, top_k: int = 10) -> list[tuple[int, float]]:
-    ids, dists = index.search(query_vec, top_k=top_k)
-    return [(int(i), float(d)) for i, d in zip(ids.tolist(), dists.tolist(), strict=True)]
+def vector_search(
+    index: VectorIndex,
+    query_vec: np.ndarray,
+    top_k: int = 10,
+    *,
+    allowed_ids: np.ndarray | list[int] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ANN search for one query -> (labels (k,), distances (k,)) as returned by the index (uint64 /
+    float32, nearest first). Callers convert only the entries they keep.
+    """
+    return index.search(query_vec, top_k=top_k, allowed_ids=allowed_ids)
+
+
+def vector_search_many(
+    index: VectorIndex,
+    queries: np.ndarray,
+    top_k: int = 10,
+    *,
+    allowed_ids: np.ndarray | list[int] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ANN search for several queries at once: (n, dim) -> (labels (n, k), distances (n, k)).
+
+    One `search_batch` call: queries are converted/normalized as one matrix and hnswlib spreads the
+    rows over its threads, instead of n separate single-query searches.
+    """
+    return index.search_batch(np.atleast_2d(queries), top_k=top_k, allowed_ids=allowed_ids)
+
+
+_FETCH_CHUNK_META_SQL = """
+SELECT rowid, id, CAST(document_id AS TEXT) AS practice_doc_id
+FROM document_chunks
+WHERE rowid IN (SELECT value FROM json_each(?));
+"""
 
 
 def _fetch_chunk_meta(conn: sqlite3.Connection, rowids: list[int]) -> dict[int, tuple[str, str]]:
@@ -49,38 +87,82 @@ def _fetch_chunk_meta(conn: sqlite3.Connection, rowids: list[int]) -> dict[int,
     Map document_chunks.rowid -> (chunk_id, practice_doc_id).
 
     NOTE: This assumes production schema:
-      document_chunks(document_id -> case_documents.id)
+      document_chunks(document_id -> case_documents.id ON DELETE CASCADE)
+    practice_doc_id is document_chunks.document_id itself (the case_documents id), so no join is
+    needed; the foreign key guarantees the document row exists.
+
+    Index use (checked by EXPLAIN QUERY PLAN in tests): one probe per rowid into document_chunks'
+    integer primary key; no table is scanned. (SQLite cannot index rowid itself, and a secondary
+    index would only add a hop.)
+
+    The rowid list is bound as one JSON array and expanded with json_each(), so the SQL text is
+    constant (one cached prepared statement for any list length, no 999-variable limit).
     """
     if not rowids:
         return {}
-    placeholders = ",".join(["?"] * len(rowids))
     rows = conn.execute(
-        f"""
-        SELECT dc.rowid, dc.id, CAST(cd.id AS TEXT) AS practice_doc_id
-        FROM document_chunks dc
-        JOIN case_documents cd ON dc.document_id = cd.id
-        WHERE dc.rowid IN ({placeholders});
-        """,
-        tuple(int(x) for x in rowids),
+        _FETCH_CHUNK_META_SQL,
+        (json.dumps([int(x) for x in rowids], separators=(",", ":")),),
     ).fetchall()
     return {int(r[0]): (str(r[1]), str(r[2])) for r in rows}
 
 
-def _embed_query(embedder: EmbedderLike, text: str) -> np.ndarray:
+class _EmbeddingLRU:
     """
-    Returns a 1D float32 vector of shape (dim,).
-    Supports embedder.embed_text() or embedder.embed_texts([text]).
+    Thread-safe LRU of query embeddings keyed by (model key, whitespace-collapsed text).
+    Values are float32 bytes; hits are rebuilt with np.frombuffer (read-only, no copy).
     """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = int(maxsize)
+        self._data: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> bytes | None:
+        with self._lock:
+            raw = self._data.get(key)
+            if raw is not None:
+                self._data.move_to_end(key)
+            return raw
+
+    def put(self, key: tuple[str, str], raw: bytes) -> None:
+        with self._lock:
+            self._data[key] = raw
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cached_embed = _EmbeddingLRU(maxsize=1024)
+
+
+def _embedder_key(embedder: EmbedderLike) -> str | None:
+    """
+    Model path + output-affecting options, or None (not cached) for embedders without a model path:
+    id(embedder) is reused after garbage collection and could serve another model's vectors.
+    """
+    model_path = getattr(embedder, "model_path", None)
+    if model_path is None:
+        return None
+    opts = (getattr(embedder, "normalize", None), getattr(embedder, "max_length", None))
+    return f"{type(embedder).__qualname__}:{model_path}:{opts}"
+
+
+def _embed_query_uncached(embedder: EmbedderLike, text: str) -> np.ndarray:
     # Prefer embed_texts if present (matches our OnnxEmbedder)
     if hasattr(embedder, "embed_texts"):
-        vec2 = np.asarray(embedder.embed_texts([text]), dtype=np.float32)  # type: ignore[attr-defined]
+        vec2 = np.ascontiguousarray(embedder.embed_texts([text]), dtype=np.float32)  # type: ignore[attr-defined]
         if vec2.ndim != 2 or vec2.shape[0] != 1:
             raise ValueError(f"Unexpected embed_texts output shape: {vec2.shape} (expected (1, dim))")
         return vec2[0]
 
     # Fallback to embed_text
     if hasattr(embedder, "embed_text"):
-        vec1 = np.asarray(embedder.embed_text(text), dtype=np.float32)  # type: ignore[attr-defined]
+        vec1 = np.ascontiguousarray(embedder.embed_text(text), dtype=np.float32)  # type: ignore[attr-defined]
         if vec1.ndim == 2 and vec1.shape[0] == 1:
             vec1 = vec1[0]
         if vec1.ndim != 1:
@@ -90,6 +172,111 @@ def _embed_query(embedder: EmbedderLike, text: str) -> np.ndarray:
     raise TypeError("Embedder must implement embed_texts(texts) or embed_text(text).")
 
 
+def _embed_query(embedder: EmbedderLike, text: str) -> np.ndarray:
+    """
+    Returns a 1D C-contiguous float32 vector of shape (dim,) (read-only when served from the
+    cache), so the index never has to re-convert or copy it for dtype/layout.
+    Supports embedder.embed_text() or embedder.embed_texts([text]).
+
+    Repeat queries skip the model via `_cached_embed`; whitespace is collapsed first so trivially
+    re-spaced queries share an entry.
+    """
+    text = " ".join(text.split())
+    model_key = _embedder_key(embedder)
+    if model_key is None:
+        return _embed_query_uncached(embedder, text)
+    key = (model_key, text)
+    raw = _cached_embed.get(key)
+    if raw is not None:
+        return np.frombuffer(raw, dtype=np.float32)
+    vec = _embed_query_uncached(embedder, text)
+    _cached_embed.put(key, np.ascontiguousarray(vec, dtype=np.float32).tobytes())
+    return vec
+
+
+def _embed_queries(embedder: EmbedderLike, texts: list[str]) -> np.ndarray:
+    """
+    (n, dim) float32 matrix for several queries: cached rows come from `_cached_embed`, the rest are
+    embedded in one embed_texts() call (embed_text() per text as a fallback). Repeated texts are
+    embedded once and expanded with a single gather.
+    """
+    normalized = [" ".join(t.split()) for t in texts]
+    texts = list(dict.fromkeys(normalized))
+    model_key = _embedder_key(embedder)
+    rows: list[np.ndarray | None] = [None] * len(texts)
+    if model_key is not None:
+        for i, t in enumerate(texts):
+            raw = _cached_embed.get((model_key, t))
+            if raw is not None:
+                rows[i] = np.frombuffer(raw, dtype=np.float32)
+
+    todo = [i for i, r in enumerate(rows) if r is None]
+    if todo:
+        if hasattr(embedder, "embed_texts"):
+            mat = np.asarray(embedder.embed_texts([texts[i] for i in todo]), dtype=np.float32)  # type: ignore[attr-defined]
+            if mat.ndim != 2 or mat.shape[0] != len(todo):
+                raise ValueError(f"Unexpected embed_texts output shape: {mat.shape} (expected ({len(todo)}, dim))")
+            fresh = list(mat)
+        else:
+            fresh = [_embed_query_uncached(embedder, texts[i]) for i in todo]
+        for i, vec in zip(todo, fresh, strict=True):
+            rows[i] = vec
+            if model_key is not None:
+                _cached_embed.put((model_key, texts[i]), np.ascontiguousarray(vec, dtype=np.float32).tobytes())
+    mat = np.stack(rows)  # type: ignore[arg-type]
+    if len(texts) == len(normalized):
+        return mat
+    slot = {t: i for i, t in enumerate(texts)}
+    return mat[[slot[t] for t in normalized]]
+
+
+def _accepted_hits(
+    rowids: list[int],
+    dists: list[float],
+    meta: dict[int, tuple[str, str]],
+    flt: VectorFilter,
+) -> Iterator[VectorHit]:
+    """
+    Hits for ANN-ranked (rowid, distance) pairs that have chunk metadata and pass `flt`, lazily and
+    in rank order. Input is already nearest-first, so taking the first k (islice) is the top-k
+    (what heapq.nsmallest would return) without consuming the rest; a re-scoring step can wrap
+    this stream.
+    """
+    want = str(flt.practice_doc_id) if flt.practice_doc_id else None
+    for rid, dist in zip(rowids, dists, strict=True):
+        m = meta.get(rid)
+        if not m:
+            continue
+        chunk_id, practice_doc_id = m
+        if want is not None and practice_doc_id != want:
+            continue
+        yield VectorHit(chunk_id=chunk_id, practice_doc_id=practice_doc_id, distance=float(dist))
+
+
+def _resolve_hits(
+    conn: sqlite3.Connection,
+    ids: np.ndarray,
+    dists: np.ndarray,
+    flt: VectorFilter,
+    k: int,
+) -> list[VectorHit]:
+    """
+    First k accepted hits for ranked ANN output. Metadata is resolved in ANN-ranked groups of k;
+    islice stops the generator once k hits are accepted, so later groups are only looked up when
+    earlier rowids lack metadata.
+    """
+    rowids = ids.tolist()
+    dist_list = dists.tolist()
+
+    def candidates() -> Iterator[VectorHit]:
+        for start in range(0, len(rowids), k):
+            group = rowids[start : start + k]
+            meta = _fetch_chunk_meta(conn, group)
+            yield from _accepted_hits(group, dist_list[start : start + k], meta, flt)
+
+    return list(islice(candidates(), k))
+
+
 def vector_retrieve(
     conn: sqlite3.Connection,
     index: VectorIndex,
@@ -102,34 +289,82 @@ def vector_retrieve(
     """
     Embed query -> ANN search -> map ids to chunk_id/practice_doc_id via SQLite.
 
-    Filtering (MVP):
-    - practice_doc_id filter is applied post-retrieval, fetching extra candidates to backfill.
+    Only reads from `conn`; services should pass a pooled connection
+    (`sqlite_readonly.readonly_pool(path).connection()`) so its statement cache is reused.
+
+    Filtering:
+    - practice_doc_id restricts the ANN search to that document's chunk rowids (pre-filter), so
+      exactly top_k matching candidates come back without overfetching.
+    - without a filter, top_k candidates are fetched (widened only to backfill stale rowids).
     """
     q = (query or "").strip()
     if not q or int(top_k) <= 0:
         return []
     flt = flt or VectorFilter()
 
+    allowed: np.ndarray | None = None
+    if flt.practice_doc_id:
+        allowed = practice_doc_rowids(conn, flt.practice_doc_id)
+        if allowed.size == 0:
+            return []
+
     qv = _embed_query(embedder, q)
+    assert qv.dtype == np.float32 and qv.flags["C_CONTIGUOUS"] and qv.ndim == 1
 
-    # Overfetch to allow filtering backfill.
-    overfetch = max(int(top_k) * 5, int(top_k))
-    pairs = vector_search(index, qv, top_k=overfetch)
-    if not pairs:
-        return []
+    k = int(top_k)
+    if allowed is not None:
+        ids, dists = vector_search(index, qv, top_k=k, allowed_ids=allowed)
+        return _resolve_hits(conn, ids, dists, flt, k)
 
-    rowids = [rid for rid, _d in pairs]
-    meta = _fetch_chunk_meta(conn, rowids)
+    # Unfiltered: the top_k nearest rowids normally all resolve, so no overfetch. The search is
+    # widened (5x per round) only when some rowids have no chunk row, e.g. chunks deleted since the
+    # index was built.
+    fetch = k
+    while True:
+        ids, dists = vector_search(index, qv, top_k=fetch)
+        hits = _resolve_hits(conn, ids, dists, flt, k)
+        if len(hits) >= k or ids.size < fetch:
+            return hits
+        fetch *= 5
 
-    out: list[VectorHit] = []
-    for rid, dist in pairs:
-        m = meta.get(rid)
-        if not m:
-            continue
-        chunk_id, practice_doc_id = m
-        if flt.practice_doc_id and str(practice_doc_id) != str(flt.practice_doc_id):
-            continue
-        out.append(VectorHit(chunk_id=chunk_id, practice_doc_id=practice_doc_id, distance=float(dist)))
-        if len(out) >= int(top_k):
-            break
+
+def vector_retrieve_many(
+    conn: sqlite3.Connection,
+    index: VectorIndex,
+    embedder: EmbedderLike,
+    queries: list[str],
+    *,
+    top_k: int = 10,
+    flt: VectorFilter | None = None,
+) -> list[list[VectorHit]]:
+    """
+    `vector_retrieve` for several queries with one embedder call, one batched ANN search and one
+    metadata lookup for the union of returned rowids. Results are per query, in input order
+    (blank queries get []).
+    """
+    out: list[list[VectorHit]] = [[] for _ in queries]
+    active = [i for i, q in enumerate(queries) if (q or "").strip()]
+    k = int(top_k)
+    if not active or k <= 0:
+        return out
+    flt = flt or VectorFilter()
+
+    allowed: np.ndarray | None = None
+    if flt.practice_doc_id:
+        allowed = practice_doc_rowids(conn, flt.practice_doc_id)
+        if allowed.size == 0:
+            return out
+
+    qm = _embed_queries(embedder, [queries[i].strip() for i in active])
+    ids, dists = vector_search_many(index, qm, top_k=k, allowed_ids=allowed)
+    if ids.size == 0:
+        return out
+    meta = _fetch_chunk_meta(conn, np.unique(ids).tolist())
+
+    for row, qi in enumerate(active):
+        hits = list(islice(_accepted_hits(ids[row].tolist(), dists[row].tolist(), meta, flt), k))
+        if len(hits) < k and allowed is None and ids.shape[1] == k:
+            # Stale rowids without chunk rows: backfill this query through the widening path.
+            hits = vector_retrieve(conn, index, embedder, queries[qi], top_k=k, flt=flt)
+        out[qi] = hits
     return out
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import os
+import sqlite3
 import sys
+from functools import cache
 from pathlib import Path
 
 
@@ -10,3 +13,14 @@ _SRC = _ROOT / "src"
 if str(_SRC) not in sys.path:
     sys.path.insert(0, str(_SRC))
 
+
+# Single-threaded hnswlib builds so index graphs are reproducible across runs.
+os.environ.setdefault("LEX_HNSW_DETERMINISTIC", "1")
+
+
+@cache
+def schema_template(ddl: str) -> sqlite3.Connection:
+    """In-memory DB with `ddl` applied, built once per DDL; tests `backup()` it into a fresh connection."""
+    con = sqlite3.connect(":memory:", check_same_thread=False)
+    con.executescript(ddl)
+    return con
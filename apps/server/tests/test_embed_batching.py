@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from lex_server.retrieval.embed_batching import BatchingEmbedder
+
+
+class RecordingEmbedder:
+    def __init__(self) -> None:
+        self.model_path = "/models/fake.onnx"
+        self.batches: list[list[str]] = []
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        self.batches.append(list(texts))
+        return np.asarray([[float(len(t)), float(ord(t[0]))] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_single_queries_are_coalesced() -> None:
+    inner = RecordingEmbedder()
+    emb = BatchingEmbedder(inner, max_batch=8, max_wait_ms=200)
+    texts = [chr(ord("a") + i) * (i + 1) for i in range(6)]
+    results: dict[str, np.ndarray] = {}
+    start = threading.Barrier(len(texts))
+
+    def run(t: str) -> None:
+        start.wait()
+        results[t] = emb.embed_texts([t])
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in texts]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert sum(len(b) for b in inner.batches) == len(texts)
+    assert len(inner.batches) < len(texts)
+    for t in texts:
+        assert results[t].shape == (1, 2)
+        assert results[t][0].tolist() == [float(len(t)), float(ord(t[0]))]
+
+
+def test_uncontended_query_does_not_wait_for_the_batch_window() -> None:
+    inner = RecordingEmbedder()
+    emb = BatchingEmbedder(inner, max_wait_ms=2000)
+    t0 = time.monotonic()
+    assert emb.embed_text("ab").tolist() == [2.0, float(ord("a"))]
+    assert emb.embed_text("c").tolist() == [1.0, float(ord("c"))]
+    assert time.monotonic() - t0 < 1.0
+    assert inner.batches == [["ab"], ["c"]]
+
+
+def test_multi_text_calls_bypass_queue_and_attrs_delegate() -> None:
+    inner = RecordingEmbedder()
+    emb = BatchingEmbedder(inner)
+    out = emb.embed_texts(["ab", "c"])
+    assert out.shape == (2, 2)
+    assert inner.batches == [["ab", "c"]]
+    assert emb.model_path == "/models/fake.onnx"
+    assert emb.embed_text("xyz").tolist() == [3.0, float(ord("x"))]
+
+
+def test_errors_propagate_to_waiting_callers() -> None:
+    class Broken:
+        def embed_texts(self, texts: list[str]) -> np.ndarray:
+            raise RuntimeError("model failed")
+
+    emb = BatchingEmbedder(Broken(), max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model failed"):
+        emb.embed_texts(["q"])
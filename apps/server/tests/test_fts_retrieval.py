@@ -3,45 +3,46 @@ from __future__ import annotations
 import sqlite3
 
 import pytest
+from conftest import schema_template
 
 from lex_server.retrieval.fts_retrieval import FtsFilter, fts_search
 
+_SCHEMA = """
+CREATE TABLE case_documents (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  case_id TEXT NOT NULL,
+  original_name TEXT NOT NULL,
+  mime TEXT NOT NULL,
+  size_bytes INTEGER NOT NULL,
+  sha256_hex TEXT NOT NULL,
+  storage_relpath TEXT NOT NULL,
+  created_at_utc TEXT NOT NULL
+);
+
+CREATE TABLE document_chunks (
+  id TEXT PRIMARY KEY,
+  document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
+  chunk_index INTEGER NOT NULL,
+  start_offset INTEGER NOT NULL,
+  end_offset INTEGER NOT NULL,
+  word_count INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+
+CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
+  chunk_id UNINDEXED,
+  text,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+"""
+
 
 def _setup_db() -> sqlite3.Connection:
     con = sqlite3.connect(":memory:")
+    schema_template(_SCHEMA).backup(con)
     con.execute("PRAGMA foreign_keys = ON;")
-
-    con.executescript(
-        """
-        CREATE TABLE case_documents (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          case_id TEXT NOT NULL,
-          original_name TEXT NOT NULL,
-          mime TEXT NOT NULL,
-          size_bytes INTEGER NOT NULL,
-          sha256_hex TEXT NOT NULL,
-          storage_relpath TEXT NOT NULL,
-          created_at_utc TEXT NOT NULL
-        );
-
-        CREATE TABLE document_chunks (
-          id TEXT PRIMARY KEY,
-          document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
-          chunk_index INTEGER NOT NULL,
-          start_offset INTEGER NOT NULL,
-          end_offset INTEGER NOT NULL,
-          word_count INTEGER NOT NULL,
-          text TEXT NOT NULL,
-          created_at TEXT NOT NULL
-        );
-
-        CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
-          chunk_id UNINDEXED,
-          text,
-          tokenize = 'unicode61'
-        );
-        """
-    )
     return con
 
 
@@ -129,3 +130,16 @@ def test_fts_filter_by_doc_type_and_date_range() -> None:
     finally:
         con.close()
 
+
+def test_fts_folds_diacritics_and_matches_prefixes() -> None:
+    con = _setup_db()
+    try:
+        d1 = _insert_doc(con, mime="text/plain", created_at_utc="2026-01-10 10:00:00")
+        c1 = _insert_chunk(con, doc_id=d1, idx=0, text="Žala atlyginama pagal sutartį.")
+        _insert_chunk(con, doc_id=d1, idx=1, text="PVM deklaracija FR0600.")
+
+        assert [h.chunk_id for h in fts_search(con, "zala", top_n=10)] == [c1]
+        assert [h.chunk_id for h in fts_search(con, "žala sutarti", top_n=10)] == [c1]
+        assert len(fts_search(con, "dekl*", top_n=10)) == 1
+    finally:
+        con.close()
@@ -103,3 +103,129 @@ def test_hybrid_retrieve_monkeypatch_merge_and_citations(monkeypatch) -> None:
 
     con.close()
 
+
+def test_vector_index_cached_until_file_changes(tmp_path) -> None:
+    import os
+
+    import numpy as np
+
+    import lex_server.retrieval.hybrid_retrieval as hr
+    from lex_server.retrieval.vector_index import VectorIndex
+
+    idx = VectorIndex(dim=4, space="cosine")
+    idx.init(max_elements=2)
+    idx.add_items(np.eye(4, dtype=np.float32)[:2], np.asarray([1, 2], dtype=np.int32))
+    index_file = idx.save(tmp_path / "idx.bin")
+
+    a = hr._get_index(str(index_file), 4, "cosine")
+    b = hr._get_index(str(index_file), 4, "cosine")
+    assert a is b
+
+    st = index_file.stat()
+    os.utime(index_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    c = hr._get_index(str(index_file), 4, "cosine")
+    assert c is not a
+    assert c.count() == 2
+    # The rebuilt index replaced the old one: a single resident slot per index file.
+    slots = [v for k, v in hr._INDEXES.items() if k[0] == str(index_file)]
+    assert len(slots) == 1 and slots[0][1] is c
+
+
+def test_hybrid_retrieve_vector_branch_uses_own_connection(tmp_path, monkeypatch) -> None:
+    dbp = tmp_path / "h.db"
+    con = sqlite3.connect(dbp)
+    con.executescript(
+        """
+        CREATE TABLE case_documents (id INTEGER PRIMARY KEY AUTOINCREMENT);
+        CREATE TABLE document_chunks (id TEXT PRIMARY KEY, document_id INTEGER NOT NULL, text TEXT NOT NULL);
+        INSERT INTO case_documents(id) VALUES (1);
+        INSERT INTO document_chunks(id, document_id, text) VALUES ('c1', 1, 'PVM FR0600'), ('c2', 1, 'kitas');
+        """
+    )
+    con.commit()
+
+    import lex_server.retrieval.hybrid_retrieval as hr
+
+    seen: list[sqlite3.Connection] = []
+
+    def fake_vector_retrieve(c, *_a, **_k):
+        seen.append(c)
+        return [VectorHit("c2", "1", 0.1)]
+
+    monkeypatch.setattr(hr, "_vector_config", lambda: ("model.onnx", "index.bin", 4))
+    monkeypatch.setattr(hr, "_get_embedder", lambda _p: object())
+    monkeypatch.setattr(hr, "_get_index", lambda *_a: object())
+    monkeypatch.setattr(hr, "fts_search", lambda _c, _q, top_n, flt: [FtsHit("c1", "1", 0.2)])
+    monkeypatch.setattr(hr, "vector_retrieve", fake_vector_retrieve)
+
+    try:
+        hits = hr.hybrid_retrieve(con, "PVM", top_n=5)
+        assert [h.chunk_id for h in hits] == ["c1", "c2"]
+        assert len(seen) == 1 and seen[0] is not con
+
+        # With an open transaction both branches read conn, so they share one snapshot.
+        con.execute("INSERT INTO document_chunks(id, document_id, text) VALUES ('c3', 1, 'naujas');")
+        assert con.in_transaction
+        hr.hybrid_retrieve(con, "PVM", top_n=5)
+        assert len(seen) == 2 and seen[1] is con
+        con.rollback()
+    finally:
+        con.close()
+
+
+def test_find_first_match_earliest_case_insensitive() -> None:
+    from lex_server.retrieval.hybrid_retrieval import _find_first_match
+
+    text = "Pradzia. PVM deklaracija FR0600"
+    assert _find_first_match(text, ["fr0600", "pvm deklaracija"]) == (9, 24)
+    # Same start position: earlier term wins.
+    assert _find_first_match("aXb", ["x", "xb"]) == (1, 2)
+    assert _find_first_match("a.b", ["."]) == (1, 2)
+    assert _find_first_match("abc", ["zz", "  "]) is None
+
+
+def test_snap_to_word_boundary_any_whitespace() -> None:
+    from lex_server.retrieval.hybrid_retrieval import _snap_to_word_boundary
+
+    text = "alpha beta\ngamma delta"
+    assert _snap_to_word_boundary(text, 13, 14) == (11, 16)  # inside "gamma": newline is a boundary
+    assert _snap_to_word_boundary(text, 2, 8) == (0, 10)
+    assert _snap_to_word_boundary(text, 0, len(text)) == (0, len(text))
+
+
+def test_extract_citations_no_terms_uses_leading_window() -> None:
+    text = ("word " * 60).strip()
+    cits = extract_citations(text, [], "u")
+    c = cits[0]
+    assert c.start == 0
+    assert c.quote == text[: c.end]
+    assert 200 <= c.end < 205 and (c.end == len(text) or text[c.end].isspace())
+    assert c.source_url == "u"
+
+
+def test_extract_citations_fast_matches_term_list_api() -> None:
+    from lex_server.retrieval.hybrid_retrieval import _compile_terms, extract_citations_fast
+
+    text = "Pradzia. PVM deklaracija FR0600 pateikiama laiku. Pabaiga."
+    for terms in (["fr0600", "PVM deklaracija"], ["neras"], []):
+        term_re = _compile_terms(terms)
+        assert extract_citations_fast(text, term_re, "u") == extract_citations(text, terms, "u")
+
+
+def test_merge_single_signal_dedups_and_orders() -> None:
+    fts = [
+        FtsHit(chunk_id="c2", practice_doc_id="d2", bm25_score=-1.5),
+        FtsHit(chunk_id="c1", practice_doc_id="d1", bm25_score=-3.0),
+        FtsHit(chunk_id="c2", practice_doc_id="dX", bm25_score=-4.0),
+    ]
+    merged = merge_and_rank(fts, [], top_n=10)
+    assert [cid for cid, _ in merged] == ["c2", "c1"]  # same 1/(1+bm25) ordering as the two-source path
+    info = dict(merged)
+    assert info["c2"]["fts_bm25"] == -4.0 and info["c2"]["practice_doc_id"] == "d2"
+    assert info["c2"]["vector_distance"] is None
+
+    vec = [VectorHit(chunk_id="v1", practice_doc_id="d1", distance=0.3), VectorHit(chunk_id="v2", practice_doc_id="d2", distance=0.1)]
+    merged = merge_and_rank(None, vec, top_n=1)
+    assert merged[0][0] == "v2"
+    assert merged[0][1]["fts_bm25"] is None
+    assert merged[0][1]["score"] == 0.4 * (1.0 / 1.1)
@@ -12,7 +12,7 @@ from lex_server.llm.orchestrator import generate_defense_directions
 
 class _FakeRuntime:
     def __init__(self, outputs: list[str], *, model_path: Path) -> None:
-        self._outputs = list(outputs)
+        self._outputs = iter(outputs)
         self.model_path = model_path
         self._backend_selected = "cpu"
 
@@ -21,9 +21,10 @@ class _FakeRuntime:
         return self._backend_selected
 
     def generate(self, prompt: str, params=None) -> str:  # match LlamaCppRuntime shape
-        if not self._outputs:
-            raise AssertionError("Fake runtime ran out of outputs")
-        return self._outputs.pop(0)
+        try:
+            return next(self._outputs)
+        except StopIteration:
+            raise AssertionError("Fake runtime ran out of outputs") from None
 
 
 def _apply_migration_0008(conn: sqlite3.Connection) -> None:
@@ -9,14 +9,15 @@ from lex_server.llm.schemas import DefenseDirectionsResponse
 
 class _FakeRuntime:
     def __init__(self, outputs: list[str]) -> None:
-        self._outputs = list(outputs)
+        self._outputs = iter(outputs)
         self.calls: list[dict[str, Any]] = []
 
     def generate(self, prompt: str, params=None) -> str:  # match LlamaCppRuntime shape
         self.calls.append({"prompt": prompt, "params": params})
-        if not self._outputs:
-            raise AssertionError("Fake runtime ran out of outputs")
-        return self._outputs.pop(0)
+        try:
+            return next(self._outputs)
+        except StopIteration:
+            raise AssertionError("Fake runtime ran out of outputs") from None
 
 
 def test_removes_paths_without_citations() -> None:
@@ -10,14 +10,15 @@ from lex_server.llm.schemas import DefenseDirectionsResponse
 
 class _FakeRuntime:
     def __init__(self, outputs: list[str]) -> None:
-        self._outputs = list(outputs)
+        self._outputs = iter(outputs)
         self.calls: list[dict[str, Any]] = []
 
     def generate(self, prompt: str, params=None) -> str:  # match LlamaCppRuntime shape
         self.calls.append({"prompt": prompt, "params": params})
-        if not self._outputs:
-            raise AssertionError("Fake runtime ran out of outputs")
-        return self._outputs.pop(0)
+        try:
+            return next(self._outputs)
+        except StopIteration:
+            raise AssertionError("Fake runtime ran out of outputs") from None
 
 
 def test_schema_accepts_valid_json() -> None:
@@ -107,3 +108,75 @@ def test_orchestrator_fallback_after_two_failures() -> None:
     assert out.missing_info
     assert out.argument_paths == []
 
+
+def test_parse_response_validates_json_in_one_pass() -> None:
+    import json
+
+    from pydantic import ValidationError
+
+    from lex_server.llm.orchestrator import _parse_response
+
+    valid = '{"argument_paths": [], "risks": ["R"], "insufficient_authority": false}'
+    assert _parse_response(valid).risks == ["R"]
+    assert _parse_response(f"Here you go:\n{valid}\nDone.").risks == ["R"]
+
+    # Well-formed JSON with a schema error is reported as such (drives the repair prompt).
+    with pytest.raises(ValidationError) as ei:
+        _parse_response('noise {"argument_paths": [{"title": "A", "claims": ["c"]}]} noise')
+    assert ei.value.errors()[0]["type"] == "string_too_short"
+
+    with pytest.raises(json.JSONDecodeError):
+        _parse_response("no object here")
+
+
+def test_schema_json_is_built_once() -> None:
+    import json
+
+    s1 = DefenseDirectionsResponse.schema_json()
+    assert DefenseDirectionsResponse.schema_json() is s1
+    assert json.loads(s1) == DefenseDirectionsResponse.model_json_schema()
+
+
+def test_parse_response_stops_at_matching_brace() -> None:
+    from lex_server.llm.orchestrator import _json_object_span, _parse_response
+
+    obj = '{"risks": ["a } b", "esc \\" {"], "missing_info": []}'
+    out = _parse_response(f"Sure: {obj} (see {{note}} later)")
+    assert out.risks == ["a } b", 'esc " {']
+
+    assert _json_object_span("no braces") is None
+    assert _json_object_span('x {"a": {"b": 1} y') == (2, 16)  # unbalanced: first '{' .. last '}'
+
+
+def test_schema_json_is_prebuilt_at_import() -> None:
+    from lex_server.llm.schemas import _schema_json
+
+    assert _schema_json.cache_info().currsize >= 1
+    hits = _schema_json.cache_info().hits
+    DefenseDirectionsResponse.schema_json()
+    assert _schema_json.cache_info().hits == hits + 1
+
+
+def test_orchestrator_repair_attempts_are_configurable() -> None:
+    rt = _FakeRuntime(["not json", "still not json", "nope"])
+    out = generate_defense_directions(
+        runtime=rt,  # type: ignore[arg-type]
+        query="gynybos kryptys",
+        citations=[],
+        params=None,
+        max_repair_attempts=2,
+    )
+    assert out.insufficient_authority is True
+    assert len(rt.calls) == 3
+    assert "still not json" in rt.calls[2]["prompt"]
+
+    rt0 = _FakeRuntime(["not json"])
+    out0 = generate_defense_directions(
+        runtime=rt0,  # type: ignore[arg-type]
+        query="gynybos kryptys",
+        citations=[],
+        params=None,
+        max_repair_attempts=0,
+    )
+    assert out0.insufficient_authority is True
+    assert len(rt0.calls) == 1
@@ -66,3 +66,16 @@ def test_dedup_case_insensitive_and_truncate_phrase_to_160() -> None:
     inner = phrase[1:-1]
     assert len(inner) <= 160
 
+
+def test_repeated_candidates_are_deduplicated_without_dropping_later_ones() -> None:
+    cf = {
+        "issues": ["Ta pati problema"] * 10_000 + ["TA PATI  problema"] * 40 + ["Kita problema"],
+        "norms": [f"CK 6.{i}" for i in range(10_000)],
+        "facts": {"keywords": ["žala", "Žala", " žala ", "sutartis"]},
+    }
+    plan = build_query_plan(cf, k=3)
+    assert [a.kind for a in plan.atoms] == ["norm", "norm", "norm"]
+
+    plan = build_query_plan({"issues": cf["issues"], "facts": cf["facts"]}, k=6)
+    # Repeats and case/whitespace variants do not crowd out the distinct issue that follows them.
+    assert [a.text for a in plan.atoms] == ['"Ta pati problema"', '"Kita problema"', "žala sutartis"]
@@ -2,45 +2,48 @@ from __future__ import annotations
 
 import sqlite3
 
+from conftest import schema_template
+
 from lex_server.retrieval.fts_retrieval import FtsFilter
 from lex_server.retrieval.query_builder import QueryAtom, QueryPlan
 from lex_server.retrieval.query_executor import execute_fts_plan
 
+_SCHEMA = """
+CREATE TABLE case_documents (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  case_id TEXT NOT NULL,
+  original_name TEXT NOT NULL,
+  mime TEXT NOT NULL,
+  size_bytes INTEGER NOT NULL,
+  sha256_hex TEXT NOT NULL,
+  storage_relpath TEXT NOT NULL,
+  created_at_utc TEXT NOT NULL
+);
+
+CREATE TABLE document_chunks (
+  id TEXT PRIMARY KEY,
+  document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
+  chunk_index INTEGER NOT NULL,
+  start_offset INTEGER NOT NULL,
+  end_offset INTEGER NOT NULL,
+  word_count INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+
+CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
+  chunk_id UNINDEXED,
+  text,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+"""
+
 
 def _setup_db() -> sqlite3.Connection:
     con = sqlite3.connect(":memory:")
+    schema_template(_SCHEMA).backup(con)
     con.execute("PRAGMA foreign_keys = ON;")
-    con.executescript(
-        """
-        CREATE TABLE case_documents (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          case_id TEXT NOT NULL,
-          original_name TEXT NOT NULL,
-          mime TEXT NOT NULL,
-          size_bytes INTEGER NOT NULL,
-          sha256_hex TEXT NOT NULL,
-          storage_relpath TEXT NOT NULL,
-          created_at_utc TEXT NOT NULL
-        );
-
-        CREATE TABLE document_chunks (
-          id TEXT PRIMARY KEY,
-          document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
-          chunk_index INTEGER NOT NULL,
-          start_offset INTEGER NOT NULL,
-          end_offset INTEGER NOT NULL,
-          word_count INTEGER NOT NULL,
-          text TEXT NOT NULL,
-          created_at TEXT NOT NULL
-        );
-
-        CREATE VIRTUAL TABLE document_chunks_fts USING fts5(
-          chunk_id UNINDEXED,
-          text,
-          tokenize = 'unicode61'
-        );
-        """
-    )
     return con
 
 
@@ -55,30 +58,42 @@ def _insert_doc(con: sqlite3.Connection, *, mime: str = "text/plain", created_at
     return int(cur.lastrowid)
 
 
-def _insert_chunk(con: sqlite3.Connection, *, doc_id: int, idx: int, text: str) -> str:
-    chunk_id = f"{doc_id}:{idx}"
-    con.execute(
-        """
-        INSERT INTO document_chunks(id, document_id, chunk_index, start_offset, end_offset, word_count, text, created_at)
-        VALUES (?, ?, ?, 0, ?, 1, ?, '2026-01-01 00:00:00');
-        """,
-        (chunk_id, doc_id, idx, len(text), text),
-    )
-    # Manual FTS insert (stable, no triggers in this in-memory setup)
-    con.execute(
-        "INSERT INTO document_chunks_fts(rowid, chunk_id, text) VALUES (last_insert_rowid(), ?, ?);",
-        (chunk_id, text),
-    )
-    return chunk_id
+def _insert_chunks(con: sqlite3.Connection, rows: list[tuple[int, int, str]]) -> list[str]:
+    """
+    Insert (doc_id, idx, text) chunks in one transaction: one executemany per table, with explicit
+    rowids so the FTS rows (no triggers in this in-memory setup) share them.
+    """
+    base = int(con.execute("SELECT COALESCE(MAX(rowid), 0) FROM document_chunks;").fetchone()[0])
+    chunk_rows = [
+        (base + i + 1, f"{doc_id}:{idx}", doc_id, idx, len(text), text) for i, (doc_id, idx, text) in enumerate(rows)
+    ]
+    with con:
+        con.executemany(
+            """
+            INSERT INTO document_chunks(rowid, id, document_id, chunk_index, start_offset, end_offset, word_count, text, created_at)
+            VALUES (?, ?, ?, ?, 0, ?, 1, ?, '2026-01-01 00:00:00');
+            """,
+            chunk_rows,
+        )
+        con.executemany(
+            "INSERT INTO document_chunks_fts(rowid, chunk_id, text) VALUES (?, ?, ?);",
+            [(r[0], r[1], r[5]) for r in chunk_rows],
+        )
+    return [r[1] for r in chunk_rows]
 
 
 def test_executor_multi_atom_merge_and_dedup() -> None:
     con = _setup_db()
     try:
         d1 = _insert_doc(con)
-        shared = _insert_chunk(con, doc_id=d1, idx=0, text="alpha beta shared content")
-        only_alpha = _insert_chunk(con, doc_id=d1, idx=1, text="alpha unique content")
-        only_beta = _insert_chunk(con, doc_id=d1, idx=2, text="beta unique content")
+        shared, only_alpha, only_beta = _insert_chunks(
+            con,
+            [
+                (d1, 0, "alpha beta shared content"),
+                (d1, 1, "alpha unique content"),
+                (d1, 2, "beta unique content"),
+            ],
+        )
 
         plan = QueryPlan(
             case_id=None,
@@ -108,8 +123,10 @@ def test_executor_weight_ranking_prefers_higher_weight() -> None:
     try:
         d1 = _insert_doc(con)
         # Keep docs similar length/structure so bm25 is similar; weight should drive order.
-        hi = _insert_chunk(con, doc_id=d1, idx=0, text="common filler alpha common filler")
-        lo = _insert_chunk(con, doc_id=d1, idx=1, text="common filler beta common filler")
+        hi, lo = _insert_chunks(
+            con,
+            [(d1, 0, "common filler alpha common filler"), (d1, 1, "common filler beta common filler")],
+        )
 
         plan = QueryPlan(
             case_id=None,
@@ -132,8 +149,7 @@ def test_executor_filters_passthrough_practice_doc_id() -> None:
     try:
         d1 = _insert_doc(con)
         d2 = _insert_doc(con)
-        c1 = _insert_chunk(con, doc_id=d1, idx=0, text="pvm deklaracija fr0600")
-        _insert_chunk(con, doc_id=d2, idx=0, text="pvm deklaracija fr0600")
+        c1, _c2 = _insert_chunks(con, [(d1, 0, "pvm deklaracija fr0600"), (d2, 0, "pvm deklaracija fr0600")])
 
         plan = QueryPlan(
             case_id=None,
@@ -147,3 +163,109 @@ def test_executor_filters_passthrough_practice_doc_id() -> None:
     finally:
         con.close()
 
+
+def test_executor_file_db_parallel_matches_serial(tmp_path) -> None:
+    mem = _setup_db()
+    try:
+        d1 = _insert_doc(mem)
+        _insert_chunks(
+            mem,
+            [
+                (d1, 0, "alpha beta shared content"),
+                (d1, 1, "alpha unique content"),
+                (d1, 2, "beta unique content"),
+                (d1, 3, "gamma content"),
+            ],
+        )
+        mem.commit()
+
+        plan = QueryPlan(
+            case_id=None,
+            atoms=[
+                QueryAtom(text="alpha", kind="keywords", weight=1.4),
+                QueryAtom(text="beta", kind="keywords", weight=1.0),
+                QueryAtom(text="gamma", kind="keywords", weight=1.2),
+            ],
+            k=3,
+        )
+        serial = execute_fts_plan(mem, plan, top_n=10, per_atom=10)
+
+        filecon = sqlite3.connect(tmp_path / "e.db")
+        try:
+            mem.backup(filecon)
+            parallel = execute_fts_plan(filecon, plan, top_n=10, per_atom=10)
+        finally:
+            filecon.close()
+
+        assert parallel == serial
+        assert len(parallel) == 4
+    finally:
+        mem.close()
+
+
+def test_executor_reads_own_uncommitted_chunks(tmp_path) -> None:
+    con = sqlite3.connect(tmp_path / "e.db")
+    try:
+        schema_template(_SCHEMA).backup(con)
+        d1 = _insert_doc(con)
+        _insert_chunks(con, [(d1, 0, "alpha content"), (d1, 1, "beta content")])
+
+        # Open transaction: pooled read-only readers would not see this row, so the serial path runs.
+        con.execute(
+            """
+            INSERT INTO document_chunks(rowid, id, document_id, chunk_index, start_offset, end_offset, word_count, text, created_at)
+            VALUES (99, ?, ?, 2, 0, 10, 2, 'alpha beta', '2026-01-01 00:00:00');
+            """,
+            (f"{d1}:2", d1),
+        )
+        con.execute("INSERT INTO document_chunks_fts(rowid, chunk_id, text) VALUES (99, ?, 'alpha beta');", (f"{d1}:2",))
+        assert con.in_transaction
+
+        plan = QueryPlan(
+            case_id=None,
+            atoms=[
+                QueryAtom(text="alpha", kind="keywords", weight=1.0),
+                QueryAtom(text="beta", kind="keywords", weight=1.0),
+            ],
+            k=2,
+        )
+        hits = execute_fts_plan(con, plan, top_n=10, per_atom=10)
+        assert sorted(h.chunk_id for h in hits) == [f"{d1}:0", f"{d1}:1", f"{d1}:2"]
+        con.rollback()
+    finally:
+        con.close()
+
+
+def test_executor_vectorized_scoring_matches_reference(monkeypatch) -> None:
+    from lex_server.retrieval import query_executor
+    from lex_server.retrieval.fts_retrieval import FtsHit
+
+    atoms = [
+        QueryAtom(kind="phrase", text="a", weight=2.0),
+        QueryAtom(kind="keyword", text="b", weight=1.0),
+        QueryAtom(kind="keyword", text="c", weight=0.5),
+    ]
+    results = [
+        [FtsHit("c1", "d1", 0.5), FtsHit("c2", "d1", 1.0)],
+        [FtsHit("c2", "d1", 0.1), FtsHit("c3", "d2", 0.2), FtsHit("c1", "d1", 0.3)],
+        [FtsHit("c4", "d3", 0.0), FtsHit("c3", "d2", 0.2)],
+    ]
+    monkeypatch.setattr(query_executor, "_search_atoms", lambda *_a, **_k: results)
+
+    best: dict[str, tuple[float, float]] = {}
+    for atom, hits in zip(atoms, results, strict=True):
+        for h in hits:
+            s = atom.weight * (1.0 / (1.0 + h.bm25_score))
+            prev = best.get(h.chunk_id, (float("-inf"), float("inf")))
+            best[h.chunk_id] = (max(prev[0], s), min(prev[1], h.bm25_score))
+    expected = sorted(best, key=lambda c: (-best[c][0], best[c][1], c))
+
+    out = execute_fts_plan(None, QueryPlan(case_id=None, atoms=atoms, k=10), top_n=3)  # type: ignore[arg-type]
+    assert [h.chunk_id for h in out] == expected[:3]
+    for h in out:
+        assert h.score == best[h.chunk_id][0]
+        assert h.bm25_score == best[h.chunk_id][1]
+        assert [m["text"] for m in h.matches] == [
+            a.text for a, hits in zip(atoms, results, strict=True) for x in hits if x.chunk_id == h.chunk_id
+        ]
+    assert out[0].practice_doc_id == "d1"
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import sqlite3
+from functools import lru_cache
 from pathlib import Path
 
 import pytest
@@ -10,11 +11,15 @@ from lex_server.retrieval.hybrid_retrieval import Citation, HybridHit
 from lex_server.retrieval.persistence import create_run, load_run_hits, persist_run_results
 
 
-def _apply_migration(conn: sqlite3.Connection) -> None:
+@lru_cache(maxsize=1)
+def _migrated_template() -> sqlite3.Connection:
     # Apply only the E5 tables; include schema_migrations for compatibility.
-    sql = (Path(__file__).resolve().parents[1] / "db" / "migrations" / "0007_retrieval_runs.sql").read_text(
-        encoding="utf-8"
+    migrations = Path(__file__).resolve().parents[1] / "db" / "migrations"
+    sql = "\n".join(
+        (migrations / name).read_text(encoding="utf-8")
+        for name in ("0007_retrieval_runs.sql", "0013_retrieval_run_hits_packed_json.sql")
     )
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
     # Also ensure schema_migrations exists in this isolated DB.
     conn.executescript(
         """
@@ -26,6 +31,22 @@ def _apply_migration(conn: sqlite3.Connection) -> None:
         """
     )
     conn.executescript(sql)
+    return conn
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    # Throwaway test DBs: skip fsyncs and the on-disk rollback journal (every commit is a write).
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA foreign_keys = ON;")
+    con.execute("PRAGMA synchronous = OFF;")
+    con.execute("PRAGMA journal_mode = MEMORY;")
+    return con
+
+
+def _apply_migration(conn: sqlite3.Connection) -> None:
+    # The migration is read and executed once per module; tests get a page-level copy.
+    _migrated_template().backup(conn)
+    conn.execute("PRAGMA foreign_keys = ON;")
 
 
 def _make_hits() -> list[HybridHit]:
@@ -59,9 +80,8 @@ def _make_hits() -> list[HybridHit]:
 
 def test_persist_and_reload_same_hits(tmp_path: Path) -> None:
     dbp = tmp_path / "t.db"
-    con = sqlite3.connect(dbp)
+    con = _connect(dbp)
     try:
-        con.execute("PRAGMA foreign_keys = ON;")
         _apply_migration(con)
 
         hits = _make_hits()
@@ -76,9 +96,8 @@ def test_persist_and_reload_same_hits(tmp_path: Path) -> None:
 
 def test_rank_order_preserved(tmp_path: Path) -> None:
     dbp = tmp_path / "t.db"
-    con = sqlite3.connect(dbp)
+    con = _connect(dbp)
     try:
-        con.execute("PRAGMA foreign_keys = ON;")
         _apply_migration(con)
 
         hits = _make_hits()
@@ -90,14 +109,31 @@ def test_rank_order_preserved(tmp_path: Path) -> None:
         con.close()
 
 
+def test_hit_without_citations_round_trips(tmp_path: Path) -> None:
+    dbp = tmp_path / "t.db"
+    con = _connect(dbp)
+    try:
+        _apply_migration(con)
+
+        hits = _make_hits()
+        hits.insert(
+            1,
+            HybridHit(chunk_id="c0", practice_doc_id="d0", score=0.85, sources={"fts_bm25": 0.4, "vector_distance": None}, citations=[]),
+        )
+        run_id = create_run(con, "q", 4, filters=None, use_fts=True, use_vector=False)
+        persist_run_results(con, run_id, hits)
+        assert load_run_hits(con, run_id) == hits
+    finally:
+        con.close()
+
+
 def test_api_hybrid_run_and_get(tmp_path: Path, monkeypatch) -> None:
     from fastapi.testclient import TestClient
 
     # Create isolated DB file and patch _db_path in router module.
     dbp = tmp_path / "api.db"
-    con = sqlite3.connect(dbp)
+    con = _connect(dbp)
     try:
-        con.execute("PRAGMA foreign_keys = ON;")
         _apply_migration(con)
     finally:
         con.close()
@@ -134,9 +170,8 @@ def test_api_hybrid_run_and_get(tmp_path: Path, monkeypatch) -> None:
 
 def test_get_run_404(tmp_path: Path) -> None:
     dbp = tmp_path / "t.db"
-    con = sqlite3.connect(dbp)
+    con = _connect(dbp)
     try:
-        con.execute("PRAGMA foreign_keys = ON;")
         _apply_migration(con)
     finally:
         con.close()
@@ -151,3 +186,99 @@ def test_get_run_404(tmp_path: Path) -> None:
     g = client.get("/api/retrieval/runs/00000000-0000-0000-0000-000000000000")
     assert g.status_code == 404
 
+
+def test_migration_backfills_legacy_citation_rows() -> None:
+    migrations = Path(__file__).resolve().parents[1] / "db" / "migrations"
+    con = sqlite3.connect(":memory:")
+    try:
+        con.execute("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY);")
+        con.executescript((migrations / "0007_retrieval_runs.sql").read_text(encoding="utf-8"))
+        run_id = create_run(con, "q", 2, filters=None, use_fts=True, use_vector=True)
+        # Pre-0013 layout: scalar source columns plus one retrieval_run_citations row per citation.
+        con.execute(
+            "INSERT INTO retrieval_run_hits(id, run_id, rank, chunk_id, practice_doc_id, score, fts_bm25, vector_distance)"
+            " VALUES (1, ?, 0, 'c1', 'd1', 0.9, 0.2, NULL), (2, ?, 1, 'c2', 'd1', 0.8, NULL, 0.1);",
+            (run_id, run_id),
+        )
+        con.execute(
+            "INSERT INTO retrieval_run_citations(hit_id, idx, quote, start, end, source_url)"
+            " VALUES (1, 1, 'Qb', 3, 5, 's'), (1, 0, 'Qa', 0, 2, NULL);"
+        )
+        con.executescript((migrations / "0013_retrieval_run_hits_packed_json.sql").read_text(encoding="utf-8"))
+
+        assert load_run_hits(con, run_id) == [
+            HybridHit(
+                chunk_id="c1",
+                practice_doc_id="d1",
+                score=0.9,
+                sources={"fts_bm25": 0.2, "vector_distance": None},
+                citations=[
+                    Citation(quote="Qa", start=0, end=2, source_url=None),
+                    Citation(quote="Qb", start=3, end=5, source_url="s"),
+                ],
+            ),
+            HybridHit(
+                chunk_id="c2",
+                practice_doc_id="d1",
+                score=0.8,
+                sources={"fts_bm25": None, "vector_distance": 0.1},
+                citations=[],
+            ),
+        ]
+    finally:
+        con.close()
+
+
+def test_repeated_quotes_share_one_string_on_load() -> None:
+    con = sqlite3.connect(":memory:")
+    try:
+        _apply_migration(con)
+        quote = "CK 6.245 str. " * 20
+        hits = [
+            HybridHit(chunk_id=f"c{i}", practice_doc_id="d", score=1.0 - i / 10, sources={},
+                      citations=[Citation(quote=quote, start=0, end=5, source_url=None)])
+            for i in range(3)
+        ]
+        run_id = create_run(con, "q", 3, filters=None, use_fts=True, use_vector=False)
+        persist_run_results(con, run_id, hits)
+        loaded = load_run_hits(con, run_id)
+        assert loaded == hits
+        assert loaded[0].citations[0].quote is loaded[2].citations[0].quote
+    finally:
+        con.close()
+
+
+def test_cached_run_hits_reuse_decoded_hits(tmp_path: Path, monkeypatch) -> None:
+    import lex_server.retrieval.persistence as pers
+
+    con = _connect(tmp_path / "t.db")
+    try:
+        _apply_migration(con)
+        hits = _make_hits()
+        run_id = create_run(con, "q", 3, filters=None, use_fts=True, use_vector=False)
+        persist_run_results(con, run_id, hits)
+
+        first = pers.load_run_hits_cached(con, run_id)
+        assert list(first) == hits
+
+        calls: list[str] = []
+        real = pers.load_run_hits
+        monkeypatch.setattr(pers, "load_run_hits", lambda c, r: calls.append(r) or real(c, r))
+        assert pers.load_run_hits_cached(con, run_id) is first
+        assert calls == []
+
+        # Committing another run (new DB mtime) leaves cached runs valid.
+        other = create_run(con, "q2", 3, filters=None, use_fts=True, use_vector=False)
+        assert pers.load_run_hits_cached(con, other) == ()  # no hits yet: not cached
+        persist_run_results(con, other, hits[1:])
+        assert pers.load_run_hits_cached(con, run_id) is first
+        assert list(pers.load_run_hits_cached(con, other)) == hits[1:]
+        assert calls == [other, other]
+
+        # Writing the run again (e.g. a re-run under the same id) drops the cached entry.
+        con.execute("DELETE FROM retrieval_run_hits WHERE run_id = ?;", (run_id,))
+        persist_run_results(con, run_id, hits[:1])
+        assert list(pers.load_run_hits_cached(con, run_id)) == hits[:1]
+        assert calls == [other, other, run_id]
+    finally:
+        con.close()
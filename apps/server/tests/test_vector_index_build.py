@@ -16,10 +16,13 @@ class FakeEmbedder:
         dims = {v.shape for v in self.mapping.values()}
         assert len(dims) == 1
         self.dim = next(iter(dims))[0]
+        # One stacked matrix + row index: embed_texts is a single fancy-index gather.
+        self._row = {k: i for i, k in enumerate(self.mapping)}
+        self._matrix = np.stack(list(self.mapping.values()))
 
     def embed_texts(self, texts: list[str]) -> np.ndarray:
-        vecs = [self.mapping[t] for t in texts]
-        return np.vstack(vecs).astype(np.float32)
+        rows = np.fromiter((self._row[t] for t in texts), dtype=np.intp, count=len(texts))
+        return self._matrix[rows]
 
 
 def _make_db(path: Path) -> sqlite3.Connection:
@@ -63,6 +66,7 @@ def test_build_then_load_then_search_deterministic(tmp_path: Path) -> None:
         out_index = tmp_path / "idx.bin"
         out_idmap = tmp_path / "idmap.json"
         build_vector_index(con, embedder, out_index, out_idmap, space="cosine", batch_size=2)
+        assert not list(tmp_path.glob("*.tmp"))  # index/meta written via temp file + rename
 
         idx = VectorIndex.load(out_index, dim=4, space="cosine")
         q = vecs["t2"]
@@ -109,3 +113,49 @@ def test_idmap_written_and_readable(tmp_path: Path) -> None:
     finally:
         con.close()
 
+
+def test_binary_idmap_round_trip(tmp_path: Path) -> None:
+    db_path = tmp_path / "t.db"
+    con = _make_db(db_path)
+    try:
+        embedder = FakeEmbedder(
+            {
+                "a": np.array([1, 0, 0, 0], dtype=np.float32),
+                "b": np.array([0, 1, 0, 0], dtype=np.float32),
+                "c": np.array([0, 0, 1, 0], dtype=np.float32),
+            }
+        )
+        with con:
+            for i, t in [(30, "a"), (7, "b"), (12, "c")]:
+                con.execute(
+                    "INSERT INTO chunks(id, chunk_id, content, practice_doc_id) VALUES (?, ?, ?, ?);",
+                    (i, f"doc:{i}-ž", t, "doc"),
+                )
+
+        out_idmap = tmp_path / "idmap.bin"
+        build_vector_index(con, embedder, tmp_path / "idx.bin", out_idmap, space="cosine", batch_size=2)
+
+        m = load_idmap(out_idmap)
+        assert len(m) == 3
+        assert sorted(m) == [7, 12, 30]
+        assert m[30] == "doc:30-ž"
+        assert m.get(8) is None
+        assert dict(m) == {7: "doc:7-ž", 12: "doc:12-ž", 30: "doc:30-ž"}
+    finally:
+        con.close()
+
+
+def test_build_rejects_embedder_claiming_normalized_output(tmp_path: Path) -> None:
+    import pytest
+
+    con = _make_db(tmp_path / "t.db")
+    try:
+        embedder = FakeEmbedder({"a": np.array([3, 0, 0, 0], dtype=np.float32)})
+        embedder.is_normalized = True  # type: ignore[attr-defined]
+        with con:
+            con.execute("INSERT INTO chunks(id, chunk_id, content, practice_doc_id) VALUES (1, 'c1', 'a', 'doc');")
+
+        with pytest.raises(ValueError, match="is_normalized"):
+            build_vector_index(con, embedder, tmp_path / "idx.bin", tmp_path / "idmap.json")
+    finally:
+        con.close()
@@ -5,52 +5,70 @@ import sqlite3
 
 import numpy as np
 import pytest
+from conftest import schema_template
 
 from lex_server.retrieval.vector_index import VectorIndex
-from lex_server.retrieval.vector_retrieval import VectorFilter, vector_retrieve, vector_search
+from lex_server.retrieval.vector_retrieval import (
+    VectorFilter,
+    vector_retrieve,
+    vector_retrieve_many,
+    vector_search,
+    vector_search_many,
+)
 
 
 class FakeEmbedder:
     def __init__(self, dim: int) -> None:
         self.dim = dim
+        self._cache: dict[str, np.ndarray] = {}
 
     def embed_text(self, text: str) -> np.ndarray:
+        # Pure function of text: memoized (read-only arrays, so sharing them is safe).
+        v = self._cache.get(text)
+        if v is None:
+            v = self._cache[text] = self._compute(text)
+        return v
+
+    def _compute(self, text: str) -> np.ndarray:
         # Deterministic embedding from sha256(text) -> float32 vector in [-1,1], then L2 normalize.
         h = hashlib.sha256(text.encode("utf-8")).digest()
         vals = np.frombuffer(h[: self.dim], dtype=np.uint8).astype(np.float32)
         v = (vals / 127.5) - 1.0
         denom = np.linalg.norm(v) + 1e-12
-        return (v / denom).astype(np.float32)
+        out = (v / denom).astype(np.float32)
+        out.setflags(write=False)
+        return out
+
+
+_SCHEMA = """
+CREATE TABLE case_documents (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  case_id TEXT NOT NULL,
+  original_name TEXT NOT NULL,
+  mime TEXT NOT NULL,
+  size_bytes INTEGER NOT NULL,
+  sha256_hex TEXT NOT NULL,
+  storage_relpath TEXT NOT NULL,
+  created_at_utc TEXT NOT NULL
+);
+
+CREATE TABLE document_chunks (
+  id TEXT PRIMARY KEY,
+  document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
+  chunk_index INTEGER NOT NULL,
+  start_offset INTEGER NOT NULL,
+  end_offset INTEGER NOT NULL,
+  word_count INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+"""
 
 
 def _setup_db() -> sqlite3.Connection:
     con = sqlite3.connect(":memory:")
+    schema_template(_SCHEMA).backup(con)
     con.execute("PRAGMA foreign_keys = ON;")
-    con.executescript(
-        """
-        CREATE TABLE case_documents (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          case_id TEXT NOT NULL,
-          original_name TEXT NOT NULL,
-          mime TEXT NOT NULL,
-          size_bytes INTEGER NOT NULL,
-          sha256_hex TEXT NOT NULL,
-          storage_relpath TEXT NOT NULL,
-          created_at_utc TEXT NOT NULL
-        );
-
-        CREATE TABLE document_chunks (
-          id TEXT PRIMARY KEY,
-          document_id INTEGER NOT NULL REFERENCES case_documents(id) ON DELETE CASCADE,
-          chunk_index INTEGER NOT NULL,
-          start_offset INTEGER NOT NULL,
-          end_offset INTEGER NOT NULL,
-          word_count INTEGER NOT NULL,
-          text TEXT NOT NULL,
-          created_at TEXT NOT NULL
-        );
-        """
-    )
     return con
 
 
@@ -66,7 +84,7 @@ def _insert_doc(con: sqlite3.Connection) -> int:
 
 def _insert_chunk(con: sqlite3.Connection, *, doc_id: int, idx: int, text: str) -> int:
     chunk_id = f"{doc_id}:{idx}"
-    con.execute(
+    cur = con.execute(
         """
         INSERT INTO document_chunks(id, document_id, chunk_index, start_offset, end_offset, word_count, text, created_at)
         VALUES (?, ?, ?, 0, ?, 1, ?, '2026-01-01 00:00:00');
@@ -74,8 +92,7 @@ def _insert_chunk(con: sqlite3.Connection, *, doc_id: int, idx: int, text: str)
         (chunk_id, doc_id, idx, len(text), text),
     )
     # Return rowid (this is what we index as hnsw label in this MVP).
-    rowid = int(con.execute("SELECT rowid FROM document_chunks WHERE id = ?;", (chunk_id,)).fetchone()[0])
-    return rowid
+    return int(cur.lastrowid)
 
 
 def test_vector_search_deterministic() -> None:
@@ -89,10 +106,11 @@ def test_vector_search_deterministic() -> None:
     idx.add_items(vecs, ids)
 
     q = vecs[2]
-    r1 = vector_search(idx, q, top_k=3)
-    r2 = vector_search(idx, q, top_k=3)
-    assert r1 == r2
-    assert r1[0][0] == int(ids[2])
+    ids1, d1 = vector_search(idx, q, top_k=3)
+    ids2, d2 = vector_search(idx, q, top_k=3)
+    assert ids1.tolist() == ids2.tolist() and d1.tolist() == d2.tolist()
+    assert int(ids1[0]) == int(ids[2])
+    assert ids1.dtype == np.uint64 and d1.dtype == np.float32
 
 
 def test_vector_retrieve_maps_to_chunk() -> None:
@@ -133,7 +151,7 @@ def test_vector_filter_practice_doc_id() -> None:
         idx = VectorIndex(dim=dim, space="cosine")
         idx.init(max_elements=2)
         v = embedder.embed_text("pvm deklaracija fr0600")
-        idx.add_items(np.vstack([v, v]), np.asarray([rid1, rid2], dtype=np.int32))
+        idx.add_items(np.repeat(v[None, :], 2, axis=0), np.asarray([rid1, rid2], dtype=np.int32))
 
         hits = vector_retrieve(
             con,
@@ -148,3 +166,435 @@ def test_vector_filter_practice_doc_id() -> None:
     finally:
         con.close()
 
+
+def test_vector_search_does_not_mutate_query() -> None:
+    dim = 8
+    idx = VectorIndex(dim=dim, space="cosine")
+    idx.init(max_elements=3)
+    idx.add_items(np.eye(dim, dtype=np.float32)[:3] * 3.0, np.arange(1, 4, dtype=np.int32))
+
+    q = np.full(dim, 2.0, dtype=np.float32)
+    before = q.copy()
+    idx.search(q, top_k=2)
+    idx.search(q, top_k=2)
+    assert np.array_equal(q, before)
+
+
+def test_vector_search_batch_matches_single_queries() -> None:
+    dim = 8
+    idx = VectorIndex(dim=dim, space="cosine")
+    idx.init(max_elements=5)
+    vecs = np.eye(dim, dtype=np.float32)[:5]
+    idx.add_items(vecs, np.arange(1, 6, dtype=np.int32))
+
+    labels, dists = idx.search_batch(vecs[[4, 0, 2]], top_k=2)
+    assert labels.shape == (3, 2) and dists.shape == (3, 2)
+    assert labels[:, 0].tolist() == [5, 1, 3]
+    for row, q in enumerate(vecs[[4, 0, 2]]):
+        ids1, d1 = idx.search(q, top_k=2)
+        assert ids1.tolist() == labels[row].tolist()
+        assert np.allclose(d1, dists[row])
+
+    labels2, _dists2 = idx.search(vecs[[4, 0, 2]], top_k=2)  # 2-D input -> batched result
+    assert labels2.tolist() == labels.tolist()
+
+
+def test_vector_search_sets_ef_only_when_it_changes() -> None:
+    dim = 8
+    idx = VectorIndex(dim=dim, space="cosine")
+    idx.init(max_elements=3)
+    idx.add_items(np.eye(dim, dtype=np.float32)[:3], np.arange(1, 4, dtype=np.int32))
+
+    calls: list[int] = []
+
+    class CountingIndex:
+        def __init__(self, inner: object) -> None:
+            self._inner = inner
+
+        def set_ef(self, ef: int) -> None:
+            calls.append(ef)
+            self._inner.set_ef(ef)  # type: ignore[attr-defined]
+
+        def __getattr__(self, name: str) -> object:
+            return getattr(self._inner, name)
+
+    idx._index = CountingIndex(idx.index)  # type: ignore[assignment]
+    q = np.ones(dim, dtype=np.float32)
+    for _ in range(5):
+        idx.search(q, top_k=2)
+    idx.set_ef(80)
+    idx.search(q, top_k=2)
+    assert calls == [50, 80, 50]
+
+
+@pytest.mark.parametrize("space", ["cosine", "l2"])
+def test_search_allowed_ids_prefilters_exact_and_graph_paths(space: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    import lex_server.retrieval.vector_index as vi
+
+    dim = 8
+    rng = np.random.default_rng(3)
+    vecs = rng.standard_normal((60, dim)).astype(np.float32)
+    idx = VectorIndex(dim=dim, space=space)  # type: ignore[arg-type]
+    idx.init(max_elements=60)
+    idx.add_items(vecs, np.arange(100, 160, dtype=np.int32))
+
+    allowed = [101, 117, 133, 149, 150, 999]  # 999 is not indexed
+    q = vecs[0]
+    ids, d = idx.search(q, top_k=3, allowed_ids=allowed)
+    assert set(ids.tolist()) <= set(allowed) and len(ids) == 3
+
+    # Same answer as an unfiltered full search restricted afterwards.
+    all_ids, all_d = idx.search(q, top_k=60)
+    expect = [(i, dd) for i, dd in zip(all_ids.tolist(), all_d.tolist(), strict=True) if i in allowed][:3]
+    assert ids.tolist() == [i for i, _ in expect]
+    assert np.allclose(d, [dd for _, dd in expect], atol=1e-5)
+
+    monkeypatch.setattr(vi, "_EXACT_SUBSET_MAX", 0)  # force hnswlib's filtered search
+    ids2, d2 = idx.search(q, top_k=3, allowed_ids=allowed)
+    assert ids2.tolist() == ids.tolist()
+    assert np.allclose(d2, d, atol=1e-5)
+
+    assert idx.search(q, top_k=3, allowed_ids=[])[0].size == 0
+
+
+def test_vector_retrieve_prefilter_does_not_overfetch() -> None:
+    dim = 8
+    embedder = FakeEmbedder(dim)
+    con = _setup_db()
+    try:
+        d1 = _insert_doc(con)
+        d2 = _insert_doc(con)
+        texts = [f"chunk {i}" for i in range(12)]
+        rids = [_insert_chunk(con, doc_id=d2, idx=i, text=t) for i, t in enumerate(texts)]
+        target = _insert_chunk(con, doc_id=d1, idx=0, text="far away")
+        rids.append(target)
+
+        idx = VectorIndex(dim=dim, space="cosine")
+        idx.init(max_elements=len(rids))
+        idx.add_items(np.vstack([embedder.embed_text(t) for t in texts + ["far away"]]), np.asarray(rids, dtype=np.int32))
+
+        # 12 closer chunks of another document would exhaust a 5x overfetch of top_k=1.
+        hits = vector_retrieve(con, idx, embedder, query="chunk 0", top_k=1, flt=VectorFilter(practice_doc_id=str(d1)))
+        assert [h.chunk_id for h in hits] == [f"{d1}:0"]
+        assert vector_retrieve(con, idx, embedder, query="chunk 0", top_k=1, flt=VectorFilter(practice_doc_id="404")) == []
+    finally:
+        con.close()
+
+
+def test_add_items_copy_false_normalizes_callers_buffer() -> None:
+    dim = 4
+    vecs = np.eye(dim, dtype=np.float32)[:2] * 3.0
+
+    idx = VectorIndex(dim=dim, space="cosine")
+    idx.init(max_elements=4)
+    idx.add_items(vecs, [1, 2])
+    assert np.array_equal(vecs, np.eye(dim, dtype=np.float32)[:2] * 3.0)
+
+    idx.add_items(vecs, [3, 4], copy=False)
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0)
+    ids, _d = idx.search(vecs[0], top_k=2)
+    assert sorted(ids.tolist()) == [1, 3]
+
+
+def test_vector_index_count_is_tracked_without_hnswlib_calls() -> None:
+    dim = 4
+    idx = VectorIndex(dim=dim, space="cosine")
+    assert idx.count() == 0 and idx.is_empty()  # safe before init (hnswlib would crash here)
+
+    idx.init(max_elements=4)
+    idx.add_items(np.eye(dim, dtype=np.float32)[:2], [1, 2])
+    assert idx.count() == 2
+    idx.add_items(np.eye(dim, dtype=np.float32)[1:3], [2, 3])  # label 2 is updated, not added
+    assert idx.count() == 3
+
+
+def test_embed_query_cache_skips_model_on_repeat() -> None:
+    from pathlib import Path
+
+    from lex_server.retrieval.vector_retrieval import _cached_embed, _embed_query
+
+    class CountingEmbedder(FakeEmbedder):
+        def __init__(self, dim: int) -> None:
+            super().__init__(dim)
+            self.model_path = Path("/models/fake.onnx")
+            self.calls = 0
+
+        def embed_text(self, text: str) -> np.ndarray:
+            self.calls += 1
+            return super().embed_text(text)
+
+    _cached_embed.cache_clear()
+    emb = CountingEmbedder(8)
+    v1 = _embed_query(emb, "PVM  deklaracija")
+    v2 = _embed_query(emb, "PVM deklaracija")
+    assert emb.calls == 1
+    assert np.array_equal(v1, v2)
+
+    plain = FakeEmbedder(8)  # no model_path: never cached
+    _embed_query(plain, "x")
+    assert len(_cached_embed._data) == 1
+    _cached_embed.cache_clear()
+
+
+def test_fetch_chunk_meta_handles_more_rowids_than_sqlite_variables() -> None:
+    from lex_server.retrieval.vector_retrieval import _fetch_chunk_meta
+
+    con = _setup_db()
+    try:
+        d1 = _insert_doc(con)
+        rid = _insert_chunk(con, doc_id=d1, idx=0, text="x")
+        meta = _fetch_chunk_meta(con, [rid] + list(range(10_000, 12_000)))
+        assert meta == {rid: (f"{d1}:0", str(d1))}
+    finally:
+        con.close()
+
+
+@pytest.mark.parametrize("case_documents_migration", ["0004_case_documents.sql", "0011_create_case_documents.sql"])
+def test_chunk_meta_queries_use_keys_not_scans(case_documents_migration: str) -> None:
+    from pathlib import Path
+
+    from lex_server.retrieval.chunk_rowids import _PRACTICE_DOC_ROWIDS_SQL
+    from lex_server.retrieval.vector_retrieval import _FETCH_CHUNK_META_SQL
+
+    migrations = Path(__file__).resolve().parents[1] / "db" / "migrations"
+    con = sqlite3.connect(":memory:")
+    try:
+        con.execute("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, applied_at TEXT);")
+        for name in (case_documents_migration, "0005_document_chunks.sql"):
+            con.executescript((migrations / name).read_text(encoding="utf-8"))
+
+        for sql, params in ((_FETCH_CHUNK_META_SQL, ("[1,2,3]",)), (_PRACTICE_DOC_ROWIDS_SQL, ("1",))):
+            plan = [str(r[3]) for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            scans = [d for d in plan if d.startswith("SCAN") and "json_each" not in d]
+            assert not scans, plan
+    finally:
+        con.close()
+
+
+def test_practice_doc_rowids_see_commits_from_other_connections(tmp_path) -> None:
+    from lex_server.retrieval.chunk_rowids import practice_doc_rowids
+
+    path = tmp_path / "lex.sqlite3"
+    src = _setup_db()
+    con = sqlite3.connect(path)
+    writer = sqlite3.connect(path)
+    try:
+        src.backup(con)
+        d1 = _insert_doc(con)
+        d2 = _insert_doc(con)
+        r1 = _insert_chunk(con, doc_id=d1, idx=0, text="a")
+        r2 = _insert_chunk(con, doc_id=d2, idx=0, text="b")
+        con.commit()
+        assert practice_doc_rowids(con, str(d2)).tolist() == [r2]
+
+        # Another connection replaces doc 2's chunk with doc 3's; max(rowid) stays the same.
+        d3 = _insert_doc(writer)
+        writer.execute("DELETE FROM document_chunks WHERE rowid = ?;", (r2,))
+        r3 = _insert_chunk(writer, doc_id=d3, idx=0, text="c")
+        writer.commit()
+        assert r3 == r2
+
+        assert practice_doc_rowids(con, str(d3)).tolist() == [r3]
+        assert practice_doc_rowids(con, str(d2)).size == 0
+        assert practice_doc_rowids(con, str(d1)).tolist() == [r1]
+        assert practice_doc_rowids(writer, str(d3)).tolist() == [r3]
+
+        # The reading connection's own uncommitted chunks are included too.
+        r4 = _insert_chunk(con, doc_id=d1, idx=1, text="d")
+        assert practice_doc_rowids(con, str(d1)).tolist() == [r1, r4]
+        con.rollback()
+    finally:
+        writer.close()
+        con.close()
+        src.close()
+
+
+def test_cosine_runs_as_inner_product_and_reads_hnswlib_cosine_files(tmp_path) -> None:
+    import hnswlib
+
+    dim = 6
+    rng = np.random.default_rng(5)
+    vecs = (rng.standard_normal((20, dim)) * 4.0).astype(np.float32)  # not unit-norm
+    q = (rng.standard_normal(dim) * 3.0).astype(np.float32)
+
+    idx = VectorIndex(dim=dim, space="cosine")
+    assert idx.index.space == "ip"
+    idx.init(max_elements=20)
+    idx.add_items(vecs, np.arange(20, dtype=np.int32))
+    ids, d = idx.search(q, top_k=20)
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    expect = 1.0 - unit[ids.astype(np.int64)] @ (q / np.linalg.norm(q))
+    assert np.allclose(d, expect, atol=1e-5)
+
+    # Index files written by hnswlib's own "cosine" space load and rank the same.
+    legacy = hnswlib.Index(space="cosine", dim=dim)
+    legacy.init_index(max_elements=20)
+    legacy.add_items(vecs, np.arange(20))
+    legacy.save_index(str(tmp_path / "index.bin"))
+    loaded = VectorIndex.load(tmp_path / "index.bin", dim=dim, space="cosine")
+    ids2, d2 = loaded.search(q, top_k=5)
+    assert ids2.tolist() == ids[:5].tolist()
+    assert np.allclose(d2, d[:5], atol=1e-5)
+
+
+def test_vector_retrieve_fetches_meta_in_ranked_groups(monkeypatch: pytest.MonkeyPatch) -> None:
+    import lex_server.retrieval.vector_retrieval as vr
+
+    dim = 8
+    embedder = FakeEmbedder(dim)
+    con = _setup_db()
+    try:
+        d1 = _insert_doc(con)
+        texts = [f"text {i}" for i in range(10)]
+        rids = [_insert_chunk(con, doc_id=d1, idx=i, text=t) for i, t in enumerate(texts)]
+        idx = VectorIndex(dim=dim, space="cosine")
+        idx.init(max_elements=len(rids) + 2)
+        idx.add_items(np.vstack([embedder.embed_text(t) for t in texts]), np.asarray(rids, dtype=np.int32))
+
+        calls: list[list[int]] = []
+        orig = vr._fetch_chunk_meta
+        monkeypatch.setattr(vr, "_fetch_chunk_meta", lambda c, r: calls.append(list(r)) or orig(c, r))
+
+        hits = vector_retrieve(con, idx, embedder, query="text 3", top_k=2)
+        assert [h.chunk_id for h in hits][0] == f"{d1}:3"
+        assert len(calls) == 1 and len(calls[0]) == 2  # not the 5x overfetch
+
+        # Rowids without metadata (e.g. deleted chunks) are backfilled by a wider search.
+        con.execute("DELETE FROM document_chunks WHERE id = ?;", (f"{d1}:3",))
+        calls.clear()
+        hits = vector_retrieve(con, idx, embedder, query="text 3", top_k=2)
+        assert len(hits) == 2 and f"{d1}:3" not in [h.chunk_id for h in hits]
+        assert [len(c) for c in calls] == [2, 2, 2]  # top_k round, then 5x round in groups of top_k
+
+        many = vector_retrieve_many(con, idx, embedder, ["text 3"], top_k=2)
+        assert [h.chunk_id for h in many[0]] == [h.chunk_id for h in hits]
+    finally:
+        con.close()
+
+
+def test_vector_retrieve_on_pooled_readonly_connection(tmp_path) -> None:
+    from lex_server.retrieval.sqlite_readonly import ReadOnlyPool
+
+    dim = 8
+    embedder = FakeEmbedder(dim)
+    path = tmp_path / "lex.sqlite3"
+    src = _setup_db()
+    con = sqlite3.connect(path)
+    try:
+        src.backup(con)
+        d1 = _insert_doc(con)
+        rid = _insert_chunk(con, doc_id=d1, idx=0, text="alpha")
+        con.commit()
+        idx = VectorIndex(dim=dim, space="cosine")
+        idx.init(max_elements=1)
+        idx.add_items(embedder.embed_text("alpha")[None, :], [rid])
+
+        pool = ReadOnlyPool(str(path), size=1)
+        for _ in range(2):  # the same connection (and its statement cache) serves both calls
+            with pool.connection() as ro:
+                hits = vector_retrieve(ro, idx, embedder, "alpha", top_k=1, flt=VectorFilter(practice_doc_id=str(d1)))
+            assert [h.chunk_id for h in hits] == [f"{d1}:0"]
+        assert pool._opened == 1
+    finally:
+        con.close()
+        src.close()
+
+
+def test_vector_search_many_matches_single_searches() -> None:
+    dim = 8
+    rng = np.random.default_rng(11)
+    vecs = rng.standard_normal((30, dim)).astype(np.float32)
+    idx = VectorIndex(dim=dim, space="cosine")
+    idx.init(max_elements=30)
+    idx.add_items(vecs, np.arange(30, dtype=np.int32))
+
+    queries = rng.standard_normal((4, dim)).astype(np.float32)
+    ids, dists = vector_search_many(idx, queries, top_k=5)
+    assert ids.shape == (4, 5) and dists.shape == (4, 5)
+    for row, q in enumerate(queries):
+        ids1, d1 = vector_search(idx, q, top_k=5)
+        assert ids1.tolist() == ids[row].tolist()
+        assert np.allclose(d1, dists[row])
+
+
+def test_vector_retrieve_many_matches_single_retrievals(monkeypatch: pytest.MonkeyPatch) -> None:
+    import lex_server.retrieval.vector_retrieval as vr
+
+    dim = 8
+    embedder = FakeEmbedder(dim)
+    con = _setup_db()
+    try:
+        d1 = _insert_doc(con)
+        d2 = _insert_doc(con)
+        texts = [f"doc text {i}" for i in range(8)]
+        rids = [_insert_chunk(con, doc_id=(d1 if i % 2 else d2), idx=i, text=t) for i, t in enumerate(texts)]
+        idx = VectorIndex(dim=dim, space="cosine")
+        idx.init(max_elements=len(rids))
+        idx.add_items(np.vstack([embedder.embed_text(t) for t in texts]), np.asarray(rids, dtype=np.int32))
+
+        calls: list[int] = []
+        orig = vr._fetch_chunk_meta
+
+        def counting_fetch(c, r):
+            calls.append(1)
+            return orig(c, r)
+
+        queries = ["doc text 1", "  ", "doc text 6"]
+        for flt in (None, VectorFilter(practice_doc_id=str(d1))):
+            calls.clear()
+            monkeypatch.setattr(vr, "_fetch_chunk_meta", counting_fetch)
+            many = vector_retrieve_many(con, idx, embedder, queries, top_k=3, flt=flt)
+            assert len(calls) == 1
+            monkeypatch.setattr(vr, "_fetch_chunk_meta", orig)
+            assert many[1] == []
+            for q, hits in zip(queries, many, strict=True):
+                if q.strip():
+                    single = vector_retrieve(con, idx, embedder, q, top_k=3, flt=flt)
+                    assert [(h.chunk_id, h.practice_doc_id) for h in hits] == [
+                        (h.chunk_id, h.practice_doc_id) for h in single
+                    ]
+                    assert np.allclose([h.distance for h in hits], [h.distance for h in single], atol=1e-5)
+    finally:
+        con.close()
+
+
+def test_embed_query_returns_contiguous_float32_for_strided_output() -> None:
+    from lex_server.retrieval.vector_retrieval import _embed_query
+
+    class StridedEmbedder:
+        def embed_text(self, text: str) -> np.ndarray:
+            return np.arange(16, dtype=np.float64)[::2]  # float64, non-contiguous
+
+    v = _embed_query(StridedEmbedder(), "q")
+    assert v.dtype == np.float32 and v.flags["C_CONTIGUOUS"] and v.shape == (8,)
+
+
+def test_vector_hit_is_slotted_and_picklable() -> None:
+    import pickle
+
+    from lex_server.retrieval.vector_retrieval import VectorHit
+
+    h = VectorHit(chunk_id="1:0", practice_doc_id="1", distance=0.25)
+    assert not hasattr(h, "__dict__")
+    assert pickle.loads(pickle.dumps(h)) == h
+    assert pickle.loads(pickle.dumps(VectorFilter(practice_doc_id="7"))) == VectorFilter(practice_doc_id="7")
+
+
+def test_embed_queries_embeds_repeated_texts_once() -> None:
+    from lex_server.retrieval.vector_retrieval import _embed_queries
+
+    class BatchEmbedder(FakeEmbedder):
+        def __init__(self, dim: int) -> None:
+            super().__init__(dim)
+            self.batches: list[list[str]] = []
+
+        def embed_texts(self, texts: list[str]) -> np.ndarray:
+            self.batches.append(list(texts))
+            return np.stack([self.embed_text(t) for t in texts])
+
+    emb = BatchEmbedder(dim=8)
+    mat = _embed_queries(emb, ["pvm  deklaracija", "žala", "pvm deklaracija"])
+    assert emb.batches == [["pvm deklaracija", "žala"]]
+    assert mat.shape == (3, 8) and mat.dtype == np.float32
+    assert np.array_equal(mat[0], mat[2])
+    assert np.array_equal(mat[1], emb.embed_text("žala"))
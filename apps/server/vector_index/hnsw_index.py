@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import bisect
 import json
-from dataclasses import dataclass
+import os
+from collections.abc import Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from itertools import chain
 from pathlib import Path
-from typing import Mapping, Sequence, cast
+from typing import Any, Literal, cast
 
 try:
     import numpy as np
@@ -20,93 +25,294 @@ except Exception as e:  # pragma: no cover
         "hnswlib is required for vector indexing. Install server deps (see requirements.txt)."
     ) from e
 
+try:  # optional: faster JSON encode/decode; stdlib json is the fallback
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore[assignment]
 
-B3_SCHEMA_VERSION = 1
+
+def _json_bytes(obj: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _read_json(path: Path) -> Any:
+    raw = path.read_bytes()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+# 1: idmap.json; 2: packed idmap (idmap_offsets.npy + idmap_ids.bin).
+B3_SCHEMA_VERSION = 2
+
+# Packs up to this many vectors are stored as a flat matrix (vectors.npy) and searched exactly with
+# one matmul; graph construction and traversal cost more than a full scan at this size.
+FLAT_INDEX_MAX = 1024
+FLAT_VECTORS_FILE = "vectors.npy"
+
+# hnswlib spaces. For vectors that are already unit-norm, "ip" gives the same distances as "cosine"
+# (1 - dot) without normalizing every query and inserted vector again.
+Space = Literal["cosine", "ip", "l2"]
+SPACES: tuple[str, ...] = ("cosine", "ip", "l2")
+
+IDMAP_OFFSETS_FILE = "idmap_offsets.npy"
+IDMAP_IDS_FILE = "idmap_ids.bin"
+
+
+class PackedChunkIds(Mapping[int, str]):
+    """
+    label -> chunk_id over the packed idmap: `offsets` (int64, n+1) into a blob of concatenated UTF-8
+    chunk ids. Both are memory-mapped by `load`, so opening a pack is O(1) and ids are decoded only
+    when looked up.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray) -> None:
+        self._offsets = offsets
+        self._blob = blob
+
+    def raw(self, label: int) -> bytes:
+        return self._blob[int(self._offsets[label]) : int(self._offsets[label + 1])].tobytes()
+
+    def __getitem__(self, label: int) -> str:
+        label = int(label)
+        if not 0 <= label < len(self):
+            raise KeyError(label)
+        return self.raw(label).decode("utf-8")
+
+    def __len__(self) -> int:
+        return int(self._offsets.shape[0]) - 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+
+class PackedChunkLabels(Mapping[str, int]):
+    """
+    chunk_id -> label for a packed idmap. Labels follow sorted(chunk_id) order and UTF-8 byte order
+    matches code-point order, so a lookup is a binary search over the packed ids.
+    """
+
+    def __init__(self, ids: PackedChunkIds) -> None:
+        self._ids = ids
+
+    def __getitem__(self, chunk_id: str) -> int:
+        key = chunk_id.encode("utf-8")
+        n = len(self._ids)
+        i = bisect.bisect_left(range(n), key, key=self._ids.raw)
+        if i < n and self._ids.raw(i) == key:
+            return i
+        raise KeyError(chunk_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._ids[i] for i in range(len(self._ids)))
+
+
+def _aligned_empty(shape: tuple[int, ...], dtype: Any, align: int = 64) -> np.ndarray:
+    """
+    Uninitialized C-contiguous array whose data starts on an `align`-byte boundary. Keeps rows of the
+    build matrix cache-line aligned for the SIMD distance loops (numpy only guarantees 16 bytes).
+    """
+    dt = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dt.itemsize
+    buf = np.empty(nbytes + align, dtype=np.uint8)
+    off = -buf.ctypes.data % align
+    return buf[off : off + nbytes].view(dt).reshape(shape)
+
+
+def _advise_sequential(path: Path) -> None:
+    """Hint the kernel that `path` is about to be read front to back (larger readahead). Best effort."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_packed_idmap(out_dir: Path, ordered_chunk_ids: Sequence[str]) -> None:
+    encoded = [cid.encode("utf-8") for cid in ordered_chunk_ids]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(out_dir / IDMAP_OFFSETS_FILE, offsets)
+    (out_dir / IDMAP_IDS_FILE).write_bytes(b"".join(encoded))
+
+
+def load_packed_idmap(pack_dir: Path) -> PackedChunkIds:
+    offsets = np.load(pack_dir / IDMAP_OFFSETS_FILE, mmap_mode="r")
+    ids_path = pack_dir / IDMAP_IDS_FILE
+    # np.memmap cannot map an empty file (all chunk ids empty strings).
+    blob = np.memmap(ids_path, dtype=np.uint8, mode="r") if ids_path.stat().st_size else np.empty(0, np.uint8)
+    return PackedChunkIds(offsets, blob)
 
 
 @dataclass
 class HNSWPackIndex:
     pack_id: str
     dim: int
-    space: str
-    index: "hnswlib.Index"
-    label_to_chunk_id: dict[int, str]
-    chunk_id_to_label: dict[str, int]
+    space: Space
+    index: hnswlib.Index | None
+    label_to_chunk_id: Mapping[int, str]
+    chunk_id_to_label: Mapping[str, int]
+    # Flat packs: the (N, dim) float32 matrix (unit rows for cosine); `index` is None.
+    flat: np.ndarray | None = None
+    # Dense label -> chunk_id (labels are 0..N-1), so hits map back with one gather. None for a
+    # packed idmap, where only the returned labels are decoded.
+    _id_by_label: np.ndarray | None = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.label_to_chunk_id, PackedChunkIds):
+            self._id_by_label = None
+            return
+        ids = np.empty(len(self.label_to_chunk_id), dtype=object)
+        for label, cid in self.label_to_chunk_id.items():
+            ids[label] = cid
+        self._id_by_label = ids
+
+    def _chunk_ids(self, labels: np.ndarray) -> list[list[str]]:
+        """chunk ids for a 2D label matrix from knn_query, as nested lists."""
+        if self._id_by_label is not None:
+            # Labels from knn_query are always in 0..N-1, so clip mode (no bounds checks) is safe.
+            return np.take(self._id_by_label, labels, mode="clip").tolist()
+        ids = self.label_to_chunk_id
+        return [[ids[lab] for lab in row] for row in labels.tolist()]
 
     @staticmethod
     def _utc_now_iso() -> str:
         return datetime.now(timezone.utc).isoformat()
 
     @staticmethod
-    def _ensure_float32_2d(a: "np.ndarray", dim: int) -> "np.ndarray":
-        arr = np.asarray(a, dtype=np.float32)
+    def _ensure_float32_2d(a: np.ndarray, dim: int) -> np.ndarray:
+        """2D C-contiguous float32 view of `a`; no copy when it already is float32 and contiguous."""
+        if isinstance(a, np.ndarray) and a.dtype == np.float32 and a.flags.c_contiguous:
+            arr = a
+        else:
+            arr = np.ascontiguousarray(a, dtype=np.float32)
         if arr.ndim == 1:
             arr = arr.reshape(1, -1)
         if arr.ndim != 2 or arr.shape[1] != dim:
             raise ValueError(f"Expected array shape (N,{dim}); got {arr.shape}")
         return arr
 
+    @staticmethod
+    def _sorted_rows(vectors: np.ndarray, raw_chunk_ids: list[str], dim: int) -> tuple[list[str], np.ndarray]:
+        """
+        (sorted chunk ids, matching float32 rows) for the ndarray input: one fancy-index gather into a
+        contiguous buffer, no per-row dict. A repeated chunk_id keeps its last row (Mapping semantics).
+        """
+        if vectors.ndim != 2 or vectors.shape[1] != dim:
+            raise ValueError(f"Expected array shape (N,{dim}); got {vectors.shape}")
+        if vectors.shape[0] != len(raw_chunk_ids):
+            raise ValueError(f"Got {vectors.shape[0]} vectors for {len(raw_chunk_ids)} chunk_ids")
+        # Stable sort: equal ids stay in input order, so the last of each run is the last occurrence.
+        order = sorted(range(len(raw_chunk_ids)), key=raw_chunk_ids.__getitem__)
+        if len(set(raw_chunk_ids)) != len(raw_chunk_ids):
+            last = len(order) - 1
+            order = [
+                i for j, i in enumerate(order) if j == last or raw_chunk_ids[order[j + 1]] != raw_chunk_ids[i]
+            ]
+        ordered_chunk_ids = [raw_chunk_ids[i] for i in order]
+        mat = np.take(vectors, order, axis=0, out=_aligned_empty((len(order), dim), np.float32))
+        return ordered_chunk_ids, mat
+
     @classmethod
     def build(
         cls,
         pack_id: str,
         dim: int,
-        vectors: Mapping[str, Sequence[float] | "np.ndarray"] | "np.ndarray",
+        vectors: Mapping[str, Sequence[float] | np.ndarray] | np.ndarray,
         chunk_ids: Sequence[str] | None,
         out_dir: Path,
         *,
-        space: str = "cosine",
+        space: Space = "cosine",
         M: int = 16,
         ef_construction: int = 200,
-    ) -> "HNSWPackIndex":
+        num_threads: int | None = None,
+        flat_max: int = FLAT_INDEX_MAX,
+    ) -> HNSWPackIndex:
         """
-        Build and persist an on-disk HNSW index for one pack.
+        Build and persist an on-disk HNSW index for one pack (packs of at most `flat_max` vectors are
+        stored flat and searched exactly, see FLAT_INDEX_MAX).
+
+        `space`: "cosine" (default), "l2", or "ip" when every vector is unit-norm already (same
+        distances as cosine, 1 - dot, minus the per-vector normalization). Recorded in meta.json.
 
         Determinism:
         - Labels are assigned 0..N-1 in sorted(chunk_id) order.
+        - Graph insertion runs on `num_threads` threads (default: all CPUs). The label -> chunk_id
+          mapping does not depend on it; graph edges may differ across multi-threaded builds.
 
         Files written under `out_dir`:
-        - hnsw.bin
-        - idmap.json
+        - hnsw.bin, or vectors.npy for flat packs
+        - idmap_offsets.npy + idmap_ids.bin (packed label -> chunk_id, see `PackedChunkIds`)
         - meta.json
         """
+        if space not in SPACES:
+            raise ValueError(f"Unsupported space {space!r} (expected one of {SPACES})")
         out_dir.mkdir(parents=True, exist_ok=True)
 
         if isinstance(vectors, np.ndarray):
             if chunk_ids is None:
                 raise ValueError("chunk_ids is required when vectors is a numpy array")
-            raw_chunk_ids = list(chunk_ids)
-            data_by_id = {cid: vectors[i] for i, cid in enumerate(raw_chunk_ids)}
+            ordered_chunk_ids, mat = cls._sorted_rows(vectors, list(chunk_ids), dim)
+            n = len(ordered_chunk_ids)
         else:
             data_by_id = dict(vectors)
+            ordered_chunk_ids = sorted(data_by_id.keys())
+            n = len(ordered_chunk_ids)
+            rows = [data_by_id[cid] for cid in ordered_chunk_ids]
+            if all(not isinstance(r, np.ndarray) and len(r) == dim for r in rows):
+                # Flat float sequences: stream every value into one typed buffer (no per-row arrays).
+                mat = np.fromiter(chain.from_iterable(rows), dtype=np.float32, count=n * dim).reshape(n, dim)
+            else:
+                # One contiguous float32 buffer filled row by row (no per-row temporaries + vstack copy).
+                mat = _aligned_empty((n, dim), np.float32)
+                for i, (cid, row) in enumerate(zip(ordered_chunk_ids, rows, strict=True)):
+                    if not isinstance(row, np.ndarray):
+                        row = np.asarray(row, dtype=np.float32)
+                    if row.size != dim:
+                        raise ValueError(f"Expected array shape (N,{dim}); got {row.shape} for chunk_id={cid!r}")
+                    mat[i] = row.reshape(dim)
 
-        ordered_chunk_ids = sorted(data_by_id.keys())
-        n = len(ordered_chunk_ids)
         if n == 0:
             raise ValueError("Cannot build index with 0 vectors")
-
+        # Every path above produces the final buffer; no revalidation pass (_ensure_float32_2d is for queries).
+        assert mat.dtype == np.float32 and mat.shape == (n, dim) and mat.flags.c_contiguous
         labels = np.arange(n, dtype=np.int32)
-        mat = np.vstack(
-            [np.asarray(data_by_id[cid], dtype=np.float32).reshape(1, -1) for cid in ordered_chunk_ids]
-        )
-        mat = cls._ensure_float32_2d(mat, dim)
 
-        idx = hnswlib.Index(space=space, dim=dim)
-        idx.init_index(max_elements=n, ef_construction=ef_construction, M=M)
-        idx.add_items(mat, labels)
+        bin_path = out_dir / "hnsw.bin"
+        flat_path = out_dir / FLAT_VECTORS_FILE
+        idx: hnswlib.Index | None = None
+        flat: np.ndarray | None = None
+        if n <= int(flat_max):
+            flat = mat
+            if space == "cosine":
+                # Stored unit-norm, so cosine distance at query time is 1 - dot.
+                flat /= np.linalg.norm(flat, axis=1, keepdims=True) + 1e-12
+            np.save(flat_path, flat)
+            bin_path.unlink(missing_ok=True)
+        else:
+            idx = hnswlib.Index(space=space, dim=dim)
+            idx.init_index(max_elements=n, ef_construction=ef_construction, M=M)
+            nt = int(num_threads) if num_threads is not None else (os.cpu_count() or 1)
+            idx.add_items(mat, labels, num_threads=max(1, nt))
+            idx.save_index(str(bin_path))
+            flat_path.unlink(missing_ok=True)
 
         label_to_chunk_id: dict[int, str] = {int(i): cid for i, cid in enumerate(ordered_chunk_ids)}
         chunk_id_to_label: dict[str, int] = {cid: int(i) for i, cid in enumerate(ordered_chunk_ids)}
 
-        bin_path = out_dir / "hnsw.bin"
-        idx.save_index(str(bin_path))
-
-        idmap_path = out_dir / "idmap.json"
-        idmap_payload = {
-            "label_to_chunk_id": {str(k): v for k, v in label_to_chunk_id.items()},
-            "chunk_id_to_label": chunk_id_to_label,
-        }
-        idmap_path.write_text(json.dumps(idmap_payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        write_packed_idmap(out_dir, ordered_chunk_ids)
+        # A rebuilt pack must not leave a stale v1 idmap behind.
+        (out_dir / "idmap.json").unlink(missing_ok=True)
 
         meta_path = out_dir / "meta.json"
         meta_payload = {
@@ -115,10 +321,11 @@ class HNSWPackIndex:
             "space": space,
             "hnsw_params": {"M": M, "ef_construction": ef_construction},
             "count": n,
+            "index_kind": "flat" if flat is not None else "hnsw",
             "created_at_utc": cls._utc_now_iso(),
             "schema_version": B3_SCHEMA_VERSION,
         }
-        meta_path.write_text(json.dumps(meta_payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        meta_path.write_bytes(_json_bytes(meta_payload))
 
         return cls(
             pack_id=pack_id,
@@ -127,26 +334,48 @@ class HNSWPackIndex:
             index=idx,
             label_to_chunk_id=label_to_chunk_id,
             chunk_id_to_label=chunk_id_to_label,
+            flat=flat,
         )
 
     @classmethod
-    def load(cls, pack_dir: Path) -> "HNSWPackIndex":
-        meta = json.loads((pack_dir / "meta.json").read_text(encoding="utf-8"))
-        idmap = json.loads((pack_dir / "idmap.json").read_text(encoding="utf-8"))
+    def load(cls, pack_dir: Path) -> HNSWPackIndex:
+        meta = _read_json(pack_dir / "meta.json")
 
         pack_id = cast(str, meta["pack_id"])
         dim = int(meta["dim"])
-        space = cast(str, meta.get("space", "cosine"))
+        space = cast(Space, meta.get("space", "cosine"))
         count = int(meta.get("count", 0))
 
-        label_to_chunk_id_raw: dict[str, str] = cast(dict[str, str], idmap["label_to_chunk_id"])
-        label_to_chunk_id: dict[int, str] = {int(k): v for k, v in label_to_chunk_id_raw.items()}
-        chunk_id_to_label: dict[str, int] = {
-            str(k): int(v) for k, v in cast(dict[str, int], idmap["chunk_id_to_label"]).items()
-        }
-
+        label_to_chunk_id: Mapping[int, str]
+        chunk_id_to_label: Mapping[str, int]
+        if int(meta.get("schema_version", 1)) >= 2:
+            packed = load_packed_idmap(pack_dir)
+            label_to_chunk_id, chunk_id_to_label = packed, PackedChunkLabels(packed)
+        else:
+            # v1 packs: idmap.json with both directions.
+            idmap = _read_json(pack_dir / "idmap.json")
+            label_to_chunk_id_raw: dict[str, str] = cast(dict[str, str], idmap["label_to_chunk_id"])
+            label_to_chunk_id = {int(k): v for k, v in label_to_chunk_id_raw.items()}
+            chunk_id_to_label = {
+                str(k): int(v) for k, v in cast(dict[str, int], idmap["chunk_id_to_label"]).items()
+            }
+
+        if meta.get("index_kind") == "flat":
+            return cls(
+                pack_id=pack_id,
+                dim=dim,
+                space=space,
+                index=None,
+                label_to_chunk_id=label_to_chunk_id,
+                chunk_id_to_label=chunk_id_to_label,
+                flat=np.load(pack_dir / FLAT_VECTORS_FILE, mmap_mode="r"),
+            )
+
+        bin_path = pack_dir / "hnsw.bin"
+        # hnswlib streams the whole graph into its own buffers; let readahead run ahead of it.
+        _advise_sequential(bin_path)
         idx = hnswlib.Index(space=space, dim=dim)
-        idx.load_index(str(pack_dir / "hnsw.bin"), max_elements=max(count, 1))
+        idx.load_index(str(bin_path), max_elements=max(count, 1))
 
         return cls(
             pack_id=pack_id,
@@ -158,35 +387,81 @@ class HNSWPackIndex:
         )
 
     def set_ef(self, ef: int) -> None:
-        self.index.set_ef(ef)
+        if self.index is not None:
+            self.index.set_ef(ef)
+
+    def count(self) -> int:
+        if self.flat is not None:
+            return int(self.flat.shape[0])
+        return int(self.index.get_current_count())  # type: ignore[union-attr]
+
+    def _knn(self, v: np.ndarray, k: int, num_threads: int = -1) -> tuple[np.ndarray, np.ndarray]:
+        """(labels, distances), each (Q, k), best first; 1 <= k <= count()."""
+        if self.flat is None:
+            # hnswlib requires ef >= k at query time, otherwise it can fail when returning results.
+            self.index.set_ef(max(int(k), 50))  # type: ignore[union-attr]
+            return self.index.knn_query(v, k=k, num_threads=num_threads)  # type: ignore[union-attr]
+
+        # Exact scan with hnswlib's distance definitions (cosine/ip: 1 - dot, l2: squared L2).
+        x = self.flat
+        if self.space == "cosine":
+            v = v / (np.linalg.norm(v, axis=1, keepdims=True) + 1e-12)
+        dots = v @ x.T
+        if self.space == "l2":
+            dist = (np.einsum("ij,ij->i", v, v)[:, None] - 2.0 * dots) + np.einsum("ij,ij->i", x, x)[None, :]
+            np.maximum(dist, 0.0, out=dist)
+        else:
+            dist = 1.0 - dots
+        n = dist.shape[1]
+        if k < n:
+            labels = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            labels = np.broadcast_to(np.arange(n), dist.shape)
+        part = np.take_along_axis(dist, labels, axis=1)
+        order = np.argsort(part, axis=1, kind="stable")
+        labels = np.take_along_axis(labels, order, axis=1)
+        return labels.astype(np.uint64), np.take_along_axis(part, order, axis=1).astype(np.float32, copy=False)
 
-    def query(self, vector: "np.ndarray", k: int) -> list[tuple[str, float]]:
+    def query(self, vector: np.ndarray, k: int) -> list[tuple[str, float]]:
         """
         Returns (chunk_id, distance) pairs ordered by best match first.
-        For cosine space, distance is the hnswlib cosine distance (lower is better).
+        For cosine and ip space, distance is 1 - dot (of the normalized query for cosine); lower is better.
         """
-        # Ensure query vector is 2D float32 contiguous.
-        v = np.asarray(vector, dtype=np.float32)
-        if v.ndim == 1:
-            v = v.reshape(1, -1)
-        if v.ndim != 2 or v.shape[1] != self.dim:
-            raise ValueError(f"Expected vector shape (N,{self.dim}); got {v.shape}")
-        v = np.ascontiguousarray(v)
+        # 1D or single-row 2D; float32 contiguous input is used as-is.
+        v = self._ensure_float32_2d(vector, self.dim)
 
         # Clamp k to the number of elements in the index.
-        get_count = getattr(self.index, "get_current_count", None)
-        n = int(get_count()) if callable(get_count) else int(len(self.label_to_chunk_id))
-        k = min(int(k), int(n))
+        k = min(int(k), self.count())
         if k <= 0:
             return []
 
-        # hnswlib requires ef >= k at query time, otherwise it can fail when returning results.
-        self.index.set_ef(max(int(k), 50))
-        labels, distances = self.index.knn_query(v, k=k)
-
-        out: list[tuple[str, float]] = []
-        for lab, dist in zip(labels[0].tolist(), distances[0].tolist(), strict=True):
-            cid = self.label_to_chunk_id[int(lab)]
-            out.append((cid, float(dist)))
-        return out
+        labels, distances = self._knn(v, k)
+        return list(zip(self._chunk_ids(labels)[0], distances[0].tolist(), strict=True))
 
+    def query_batch(self, vectors: np.ndarray, k: int, num_threads: int = -1) -> list[list[tuple[str, float]]]:
+        """
+        `query` for several vectors in one knn_query call (hnswlib parallelizes over rows;
+        num_threads=-1 uses all CPUs; flat packs use one matmul). Returns one (chunk_id, distance) list per input row.
+        """
+        v = self._ensure_float32_2d(vectors, self.dim)
+        k = min(int(k), self.count())
+        if k <= 0 or v.shape[0] == 0:
+            return [[] for _ in range(v.shape[0])]
+
+        labels, distances = self._knn(v, k, int(num_threads))
+        ids = self._chunk_ids(labels)
+        return [
+            list(zip(row_ids, row_dists, strict=True))
+            for row_ids, row_dists in zip(ids, distances.tolist(), strict=True)
+        ]
+
+
+def search_many(indices: Sequence[HNSWPackIndex], vector: np.ndarray, k: int) -> list[list[tuple[str, float]]]:
+    """
+    `query(vector, k)` on every pack, concurrently. hnswlib's knn_query and the flat-pack matmul release
+    the GIL, so packs are searched on separate cores. Results are in `indices` order.
+    """
+    if len(indices) <= 1:
+        return [idx.query(vector, k) for idx in indices]
+    with ThreadPoolExecutor(max_workers=min(len(indices), os.cpu_count() or 1)) as pool:
+        return list(pool.map(lambda idx: idx.query(vector, k), indices))
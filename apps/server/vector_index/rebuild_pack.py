@@ -6,11 +6,11 @@ from pathlib import Path
 import numpy as np
 
 try:
-    from .hnsw_index import HNSWPackIndex
+    from .hnsw_index import HNSWPackIndex, Space
     from .paths import pack_index_dir
 except ImportError:  # pragma: no cover
     # Support running as plain scripts (no package context).
-    from hnsw_index import HNSWPackIndex  # type: ignore[no-redef]
+    from hnsw_index import HNSWPackIndex, Space  # type: ignore[no-redef]
     from paths import pack_index_dir  # type: ignore[no-redef]
 
 
@@ -19,26 +19,46 @@ def rebuild_pack_index(
     dim: int,
     vectors_by_chunk_id: dict[str, "np.ndarray"],
     indices_root: Path,
+    *,
+    num_threads: int | None = None,
+    space: Space = "cosine",
 ) -> Path:
     """
     B3 MVP strategy: rebuild per pack apply.
 
-    This intentionally does NOT do incremental updates. Whenever a pack is (re)applied,
-    we wipe the pack's index directory and build a fresh index from the vectors provided
-    by the caller.
+    This intentionally does NOT do incremental updates. Whenever a pack is (re)applied, a fresh
+    index is built from the vectors provided by the caller into a sibling staging directory
+    (`<pack>.new`) and then swapped in by rename, so the live pack directory is never half-written.
+    Readers that already mapped the old files keep working until they drop them.
+
+    Pass `space="ip"` when the vectors are known to be unit-norm (see `HNSWPackIndex.build`).
     """
     pack_dir = pack_index_dir(indices_root, pack_id)
-    if pack_dir.exists():
-        shutil.rmtree(pack_dir)
-    pack_dir.mkdir(parents=True, exist_ok=True)
-
-    HNSWPackIndex.build(
-        pack_id=pack_id,
-        dim=dim,
-        vectors=vectors_by_chunk_id,
-        chunk_ids=None,
-        out_dir=pack_dir,
-        space="cosine",
-    )
-    return pack_dir
+    staging = pack_dir.with_name(pack_dir.name + ".new")
+    old = pack_dir.with_name(pack_dir.name + ".old")
+    for leftover in (staging, old):  # from an interrupted earlier rebuild
+        if leftover.exists():
+            shutil.rmtree(leftover)
+    staging.mkdir(parents=True)
 
+    try:
+        HNSWPackIndex.build(
+            pack_id=pack_id,
+            dim=dim,
+            vectors=vectors_by_chunk_id,
+            chunk_ids=None,
+            out_dir=staging,
+            space=space,
+            num_threads=num_threads,
+        )
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    had_old = pack_dir.exists()
+    if had_old:
+        pack_dir.rename(old)
+    staging.rename(pack_dir)
+    if had_old:
+        shutil.rmtree(old, ignore_errors=True)
+    return pack_dir
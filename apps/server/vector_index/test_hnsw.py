@@ -10,13 +10,21 @@ THIS_DIR = Path(__file__).resolve().parent
 if str(THIS_DIR) not in sys.path:
     sys.path.insert(0, str(THIS_DIR))
 
-from hnsw_index import HNSWPackIndex  # noqa: E402
+from hnsw_index import FLAT_INDEX_MAX, HNSWPackIndex, search_many  # noqa: E402
 
 
 def _normalize_rows(x: np.ndarray) -> np.ndarray:
-    x = x.astype(np.float32, copy=False)
-    norms = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
-    return x / norms
+    # Row norms via einsum (no squared temporary), then one in-place divide on a private copy.
+    x = np.array(x, dtype=np.float32, copy=True)
+    norms = np.sqrt(np.einsum("ij,ij->i", x, x))
+    norms += 1e-12
+    x /= norms[:, None]
+    return x
+
+
+def _same_hits(a: list[tuple[str, float]], b: list[tuple[str, float]]) -> bool:
+    # Same ids in the same order; distances may differ by float rounding (batched vs single matmul).
+    return [c for c, _d in a] == [c for c, _d in b] and np.allclose([d for _c, d in a], [d for _c, d in b], atol=1e-5)
 
 
 def main() -> None:
@@ -31,38 +39,59 @@ def main() -> None:
     chunk_ids = [f"c{i:03d}" for i in range(n)]
     vectors_by_chunk_id = {cid: base[i] for i, cid in enumerate(chunk_ids)}
 
-    out_dir = Path(".localdata") / "indices" / pack_id
-
-    # Build & reload from disk.
-    HNSWPackIndex.build(
-        pack_id=pack_id,
-        dim=dim,
-        vectors=vectors_by_chunk_id,
-        chunk_ids=None,
-        out_dir=out_dir,
-        space="cosine",
-    )
-    idx = HNSWPackIndex.load(out_dir)
-
-    # 5 queries equal to existing vectors + small noise.
+    # 5 queries equal to existing vectors + small noise, searched in one batch.
     picks = [0, 7, 13, 23, 49]
-    ok = 0
-    for p in picks:
-        expected = chunk_ids[p]
-        q = base[p] + rng.normal(scale=0.001, size=(dim,)).astype(np.float32)
-        q = q / (np.linalg.norm(q) + 1e-12)
+    queries = base[picks] + rng.normal(scale=0.001, size=(len(picks), dim)).astype(np.float32)
+    queries = _normalize_rows(queries)
 
-        top = idx.query(q, k=1)
-        got = top[0][0]
-        if got != expected:
-            raise AssertionError(f"Top1 mismatch: expected={expected}, got={got}, res={top}")
-        ok += 1
+    # Build & reload from disk, once as an HNSW graph and once as a flat (exact) pack.
+    results: dict[str, list[list[tuple[str, float]]]] = {}
+    loaded: list[HNSWPackIndex] = []
+    ok = 0
+    # Inputs are unit-norm, so an "ip" graph must rank exactly like the cosine one.
+    for kind, flat_max, space in (("hnsw", 0, "cosine"), ("flat", FLAT_INDEX_MAX, "cosine"), ("hnsw_ip", 0, "ip")):
+        out_dir = Path(".localdata") / "indices" / f"{pack_id}_{kind}"
+        HNSWPackIndex.build(
+            pack_id=pack_id,
+            dim=dim,
+            vectors=vectors_by_chunk_id,
+            chunk_ids=None,
+            out_dir=out_dir,
+            space=space,
+            flat_max=flat_max,
+        )
+        idx = HNSWPackIndex.load(out_dir)
+        if (idx.flat is not None) != (kind == "flat") or idx.space != space:
+            raise AssertionError(f"Expected a {kind} pack in {out_dir}")
+        loaded.append(idx)
+
+        results[kind] = idx.query_batch(queries, k=5)
+        for i, (p, top) in enumerate(zip(picks, results[kind], strict=True)):
+            expected = chunk_ids[p]
+            got = top[0][0]
+            if got != expected:
+                raise AssertionError(f"[{kind}] Top1 mismatch: expected={expected}, got={got}, res={top}")
+            if not _same_hits(idx.query(queries[i], k=5), top):
+                raise AssertionError(f"[{kind}] query/query_batch mismatch for {expected}")
+            ok += 1
+
+    for h, f, ip in zip(results["hnsw"], results["flat"], results["hnsw_ip"], strict=True):
+        if not _same_hits(h, f):
+            raise AssertionError(f"hnsw/flat mismatch: {h} vs {f}")
+        if not _same_hits(h, ip):
+            raise AssertionError(f"cosine/ip mismatch: {h} vs {ip}")
+
+    # Fan-out over both packs matches the per-pack queries.
+    for i in range(len(picks)):
+        fanned = search_many(loaded, queries[i], k=5)
+        if not all(_same_hits(hits, results[kind][i]) for hits, kind in zip(fanned, results, strict=True)):
+            raise AssertionError(f"search_many mismatch for {chunk_ids[picks[i]]}: {fanned}")
 
     print("HNSW B3 test OK")
     print(f"- pack_id={pack_id}")
     print(f"- dim={dim}")
     print(f"- vectors={n}")
-    print(f"- queries_ok={ok}/{len(picks)}")
+    print(f"- queries_ok={ok}/{len(results) * len(picks)} ({' + '.join(results)})")
 
 
 if __name__ == "__main__":